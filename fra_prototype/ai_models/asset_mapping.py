@@ -1,9 +1,12 @@
 # ai_models/asset_mapping.py
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
+import pandas as pd
 import cv2
 import geopandas as gpd
-from shapely.geometry import Polygon
+import shapely
 from dotenv import load_dotenv
 from sentinelhub import (
     SentinelHubRequest, DataCollection, MimeType, CRS, BBox, SHConfig
@@ -23,6 +26,14 @@ sh_config.sh_client_secret = CLIENT_SECRET
 if not CLIENT_ID or not CLIENT_SECRET:
     raise ValueError("⚠️ Sentinel Hub credentials not set in .env")
 
+# Sentinel Hub requests are latency-bound HTTPS calls; run them side by side.
+_SH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sentinelhub")
+
+# Debug previews (debug_*.png, truecolor_satellite.png) cost a normalize + PNG
+# encode + disk write each; only produce them when FRA_DEBUG_MASKS=1, off the hot path.
+_DEBUG = os.getenv("FRA_DEBUG_MASKS", "0").strip().lower() in ("1", "true", "yes")
+_IO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="preview-io") if _DEBUG else None
+
 # ============================================================
 # Evalscripts
 # ============================================================
@@ -38,40 +49,88 @@ function setup() {
 function evaluatePixel(s) { return [s.B04, s.B03, s.B02]; }
 """
 
-# NDVI
-EVALSCRIPT_NDVI = """//VERSION=3
-function setup(){ return { input:["B08","B04"], output:{ bands:1 } }; }
-function evaluatePixel(s){ return [(s.B08 - s.B04) / (s.B08 + s.B04)]; }
-"""
-
-# NDWI (McFeeters; G - NIR) using B03/B08
-EVALSCRIPT_NDWI = """//VERSION=3
-function setup(){ return { input:["B03","B08"], output:{ bands:1 } }; }
-function evaluatePixel(s){ return [(s.B03 - s.B08) / (s.B03 + s.B08)]; }
-"""
-
 # MULTIBAND: Blue, Green, Red, NIR, SWIR1
+# (NDVI and NDWI are derived locally from these bands; one request instead of three)
+# Reflectance is shipped as UINT16 scaled by REFLECTANCE_SCALE: full 1e-4 precision
+# at half the bytes of FLOAT32, and no clipping at 1.0 like the default 8-bit output.
+REFLECTANCE_SCALE = 10000
 EVALSCRIPT_MULTIBAND = """//VERSION=3
 function setup() {
   return {
     input: ["B02","B03","B04","B08","B11"],
-    output: { bands: 5 }
+    output: { bands: 5, sampleType: "UINT16" }
   };
 }
-function evaluatePixel(s) { return [s.B02, s.B03, s.B04, s.B08, s.B11]; }
-"""
+function evaluatePixel(s) {
+  return [s.B02, s.B03, s.B04, s.B08, s.B11].map(v => v * %d);
+}
+""" % REFLECTANCE_SCALE
 
 # ============================================================
 # Helpers
 # ============================================================
 
+# Percentiles used for the contrast stretch; robust to clouds / specular pixels.
+NORM_PCT = (1.0, 99.0)
+
+def _stretch_uint8(a: np.ndarray) -> np.ndarray:
+    """
+    uint8 fast path of _normalize_to_uint8: percentiles from a 256-bin histogram and
+    a lookup-table stretch, with no float32 copy. Full-range input is returned as-is.
+    """
+    hist = np.bincount(a.ravel(), minlength=256)
+    present = np.flatnonzero(hist)
+    if present.size < 2:  # empty or constant
+        return np.zeros_like(a)
+    cdf = np.cumsum(hist)
+    ranks = np.asarray(NORM_PCT) / 100.0 * (cdf[-1] - 1)
+    mn, mx = np.searchsorted(cdf, ranks, side="right")
+    if mx <= mn:
+        mn, mx = present[0], present[-1]
+    if mn == 0 and mx == 255:
+        return a
+    lut = np.clip((np.arange(256, dtype=np.float32) - mn) * (255.0 / (mx - mn)), 0, 255).astype(np.uint8)
+    return lut[a]
+
 def _normalize_to_uint8(arr: np.ndarray) -> np.ndarray:
-    a = np.asarray(arr).astype(np.float32)
-    mn, mx = np.nanmin(a), np.nanmax(a)
+    a = np.asarray(arr)
+    if a.dtype == np.bool_:
+        a = a.view(np.uint8)
+    if a.dtype == np.uint8:
+        return _stretch_uint8(a)
+    a = a.astype(np.float32)
+    mn, mx = np.nanpercentile(a, NORM_PCT)
+    if np.isfinite(mn) and np.isfinite(mx) and mx - mn < 1e-12:
+        # sparse masks (e.g. <1% water) collapse under percentiles; use full range
+        mn, mx = np.nanmin(a), np.nanmax(a)
     if not np.isfinite(mn) or not np.isfinite(mx) or mx - mn < 1e-12:
         return np.zeros_like(a, dtype=np.uint8)
-    a = (a - mn) / (mx - mn + 1e-12)
-    return (a * 255).clip(0, 255).astype(np.uint8)
+    buf = np.subtract(a, mn)
+    np.multiply(buf, 255.0 / (mx - mn + 1e-12), out=buf)
+    return np.clip(buf, 0, 255, out=buf).astype(np.uint8, copy=False)
+
+def _normalize_to_uint8_multi(arr: np.ndarray, axes=(0, 1)) -> np.ndarray:
+    """
+    Per-channel 1st/99th percentile stretch of an (H, W, C) stack to uint8 in one fused pass.
+    Channels that are constant or all-NaN come out as zeros.
+    """
+    a = np.asarray(arr, dtype=np.float32)
+    mn, mx = np.nanpercentile(a, NORM_PCT, axis=axes, keepdims=True).astype(np.float32)
+    flat = np.isfinite(mn) & np.isfinite(mx) & (mx - mn < 1e-12)
+    if flat.any():
+        # same sparse-mask fallback as _normalize_to_uint8
+        mn = np.where(flat, np.nanmin(a, axis=axes, keepdims=True), mn)
+        mx = np.where(flat, np.nanmax(a, axis=axes, keepdims=True), mx)
+    ok = np.isfinite(mn) & np.isfinite(mx) & (mx - mn >= 1e-12)
+    scale = np.where(ok, np.float32(255.0) / (mx - mn + 1e-12), 0).astype(np.float32)
+    mn = np.where(ok, mn, 0).astype(np.float32)
+
+    tmp = np.subtract(a, mn)
+    np.multiply(tmp, scale, out=tmp)
+    np.clip(tmp, 0, 255, out=tmp)
+    out = np.empty(a.shape, np.uint8)
+    out[...] = tmp
+    return out
 
 def save_mask(mask, filename, thresh=None):
     """
@@ -100,23 +159,18 @@ def save_mask(mask, filename, thresh=None):
 
     # 3- or 4-channel -> normalize first 3 channels and save as RGB
     if m.ndim == 3 and m.shape[2] in (3, 4):
-        rgb = np.dstack([_normalize_to_uint8(m[:, :, 0]),
-                         _normalize_to_uint8(m[:, :, 1]),
-                         _normalize_to_uint8(m[:, :, 2])])
-        cv2.imwrite(filename, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        # reversed channel view is already BGR for cv2.imwrite
+        bgr = _normalize_to_uint8_multi(m[:, :, 2::-1])
+        cv2.imwrite(filename, bgr)
         print(f"💾 Saved preview: {filename}")
         return
 
     # >3 channels (e.g., B,G,R,NIR,SWIR1): build an RGB preview using R,G,B = 2,1,0
     if m.ndim == 3 and m.shape[2] > 3:
-        # safe indexing even if fewer than 3 bands for some reason
-        r_idx = 2 if m.shape[2] > 2 else 0
-        g_idx = 1 if m.shape[2] > 1 else 0
-        b_idx = 0
-        rgb = np.dstack([_normalize_to_uint8(m[:, :, r_idx]),
-                         _normalize_to_uint8(m[:, :, g_idx]),
-                         _normalize_to_uint8(m[:, :, b_idx])])
-        cv2.imwrite(filename, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        r_idx, g_idx, b_idx = 2, 1, 0
+        # bands 0,1,2 are B,G,R -> already BGR order for cv2.imwrite
+        bgr = _normalize_to_uint8_multi(m[:, :, :3])
+        cv2.imwrite(filename, bgr)
         print(f"💾 Saved multiband preview (RGB from bands {r_idx},{g_idx},{b_idx}): {filename}")
         return
 
@@ -126,34 +180,85 @@ def save_mask(mask, filename, thresh=None):
     print(f"💾 Saved (fallback) mask: {filename}")
 
 
+def _save_preview(mask, filename):
+    """Queue a save_mask() on the background I/O pool when debug previews are enabled."""
+    if _DEBUG:
+        _IO_POOL.submit(save_mask, mask, filename)
+
+
 def clean_mask(binary_mask: np.ndarray, close_iters=2, open_iters=0, dilate_iters=3):
     """
     Connect thin linear features (rivers) and thicken slightly.
     Input/Output are 0/1 arrays.
     """
     m = (binary_mask > 0).astype(np.uint8)
-    kernel = np.ones((3, 3), np.uint8)
+    # n passes of a 3x3 square == one pass of a (2n+1) square; rectangular
+    # kernels also hit OpenCV's separable row/column fast path.
     if close_iters:
-        m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, kernel, iterations=close_iters)
+        m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, _rect_kernel(close_iters))
     if open_iters:
-        m = cv2.morphologyEx(m, cv2.MORPH_OPEN, kernel, iterations=open_iters)
+        m = cv2.morphologyEx(m, cv2.MORPH_OPEN, _rect_kernel(open_iters))
     if dilate_iters:
-        m = cv2.dilate(m, kernel, iterations=dilate_iters)
+        m = cv2.dilate(m, _rect_kernel(dilate_iters))
     return m
 
+@lru_cache(maxsize=16)
+def _rect_kernel(iters: int) -> np.ndarray:
+    """
+    Square structuring element equivalent to `iters` passes of a 3x3 kernel.
+    Built once per size and shared (read-only) across calls.
+    """
+    size = 2 * int(iters) + 1
+    k = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+    k.setflags(write=False)
+    return k
+
+def _normalized_difference(a, b, eps=1e-6, out=None, scratch=None):
+    """
+    (a - b) / (a + b + eps) using two buffers instead of four temporaries.
+    `scratch` holds the denominator and can be shared between calls;
+    `out` may alias `a` or `b`.
+    """
+    if out is None:
+        out = np.empty_like(a)
+    if scratch is None:
+        scratch = np.empty_like(a)
+    np.add(a, b, out=scratch)
+    np.add(scratch, eps, out=scratch)
+    np.subtract(a, b, out=out)
+    np.divide(out, scratch, out=out)
+    return out
+
 # ============================================================
 # Fetch Index from Sentinel Hub
 # ============================================================
+# Ground sampling of the default fetch (0.02 deg across 1536 px); windowed fetches keep it
+FETCH_DEG_PER_PX = 0.02 / 1536
+SH_MAX_PX = 2500  # Sentinel Hub Process API limit per side
+
+def _window_size(bbox):
+    """Pixel size (w, h) that covers bbox at FETCH_DEG_PER_PX, so min_area thresholds keep their meaning."""
+    minx, miny, maxx, maxy = bbox
+    w = int(np.ceil((maxx - minx) / FETCH_DEG_PER_PX))
+    h = int(np.ceil((maxy - miny) / FETCH_DEG_PER_PX))
+    return (min(max(w, 1), SH_MAX_PX), min(max(h, 1), SH_MAX_PX))
+
 def fetch_index(claim_geometry, evalscript, filename, size=(1536, 1536),
-                time_interval=("2023-06-01", "2023-10-31")):
+                time_interval=("2023-06-01", "2023-10-31"), window_bounds=None):
     """
     Generic fetcher for single or multi-band arrays.
-    Saves a visualization PNG and returns (numpy array, bbox).
+    window_bounds: optional (minx, miny, maxx, maxy) in EPSG:4326 to fetch instead of the
+    fixed ±0.01 deg box around the claim; size is then derived from it.
+    Returns (numpy array, bbox); queues a visualization PNG when FRA_DEBUG_MASKS=1.
     """
-    bounds = claim_geometry.bounds
-    buffer_deg = 0.01  # ~500–1100 m depending on latitude
-    bbox = (bounds[0]-buffer_deg, bounds[1]-buffer_deg,
-            bounds[2]+buffer_deg, bounds[3]+buffer_deg)
+    if window_bounds is not None:
+        bbox = tuple(float(v) for v in window_bounds)
+        size = _window_size(bbox)
+    else:
+        bounds = claim_geometry.bounds
+        buffer_deg = 0.01  # ~500–1100 m depending on latitude
+        bbox = (bounds[0]-buffer_deg, bounds[1]-buffer_deg,
+                bounds[2]+buffer_deg, bounds[3]+buffer_deg)
     sh_bbox = BBox(bbox, crs=CRS.WGS84)
 
     request = SentinelHubRequest(
@@ -173,43 +278,62 @@ def fetch_index(claim_geometry, evalscript, filename, size=(1536, 1536),
 
     # robust preview save
     if data.ndim == 2:
-        save_mask(data, filename)
+        _save_preview(data, filename)
     elif data.ndim == 3:
         if data.shape[2] == 1:
-            save_mask(data[..., 0], filename)
+            _save_preview(data[..., 0], filename)
         else:
-            save_mask(data, filename)  # multi-band preview
+            _save_preview(data, filename)  # multi-band preview
     else:
-        save_mask(np.squeeze(data), filename)
+        _save_preview(np.squeeze(data), filename)
 
     return data, bbox
 
 def mask_to_geopolygons(mask, bbox, min_area=200):
     """
-    Convert a binary mask (0/1 or 0/255) to polygons in EPSG:4326.
+    Convert a binary mask to polygons in EPSG:4326.
+    Expects a uint8 mask (0/1 or 0/255, any nonzero counts as foreground) and
+    uses it without copying; bool and other dtypes are converted first.
     min_area: minimum contour area in pixels.
     """
     minx, miny, maxx, maxy = bbox
     if mask.ndim == 3:
         mask = mask[..., 0]
-    m = (mask > 0).astype(np.uint8)
-
-    contours, _ = cv2.findContours(m * 255, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
+    if mask.dtype == np.uint8:
+        m = mask
+    elif mask.dtype == np.bool_:
+        m = mask.view(np.uint8)
+    else:
+        m = (mask > 0).astype(np.uint8)
+
+    # A component's bounding-box area bounds its external contour area from above
+    # (the pixel count does not: RETR_EXTERNAL fills holes), so components whose box
+    # is smaller than min_area can never pass the contourArea filter: drop them
+    # before tracing (sparse masks are often thousands of specks).
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(m, connectivity=8, ltype=cv2.CV_32S)
+    small = stats[1:, cv2.CC_STAT_WIDTH] * stats[1:, cv2.CC_STAT_HEIGHT] < min_area
+    if small.all():
+        return []
+    if small.any():
+        lut = np.zeros(n, np.uint8)
+        lut[1:][~small] = 255
+        m = lut[labels]
+
+    contours, _ = cv2.findContours(m, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    kept = [c for c in contours if len(c) > 2 and cv2.contourArea(c) >= min_area]
+    if not kept:
+        return []
+
+    # Stack every kept contour into one (sum_n, 2) array + ring ids, convert to
+    # lon/lat in one pass and build all polygons with Shapely's vectorized constructors.
     h, w = m.shape
-    polygons = []
-    for contour in contours:
-        if cv2.contourArea(contour) < min_area:
-            continue
-        coords = []
-        for pt in contour:
-            x, y = pt[0]
-            lon = minx + (x / w) * (maxx - minx)
-            lat = maxy - (y / h) * (maxy - miny)
-            coords.append((lon, lat))
-        if len(coords) > 2:
-            polygons.append(Polygon(coords))
-    return polygons
+    pts = np.concatenate([c.reshape(-1, 2) for c in kept]).astype(np.float64)
+    ring_ids = np.repeat(np.arange(len(kept)), [len(c) for c in kept])
+    coords = np.column_stack([minx + pts[:, 0] * ((maxx - minx) / w),
+                              maxy - pts[:, 1] * ((maxy - miny) / h)])
+    rings = shapely.linearrings(coords, indices=ring_ids)
+    return list(shapely.polygons(rings))
 
 def fetch_rgb(claim_geometry, filename="truecolor_satellite.png",
               size=(1024, 1024),
@@ -235,70 +359,91 @@ def fetch_rgb(claim_geometry, filename="truecolor_satellite.png",
 
     data = request.get_data()[0]  # float reflectance 0..~1
     # to 8-bit RGB
-    img = (_normalize_to_uint8(data) if data.ndim == 2
-           else np.dstack([_normalize_to_uint8(data[:, :, i]) for i in range(3)]))
-    cv2.imwrite(filename, cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+    if data.ndim == 2:
+        cv2.imwrite(filename, _normalize_to_uint8(data))
+    else:
+        cv2.imwrite(filename, _normalize_to_uint8_multi(data[:, :, 2::-1]))
     print(f"🛰️ Saved true color satellite image at {filename}")
     return filename, bbox
 
 # ============================================================
 # Detect Assets
 # ============================================================
-def detect_assets(claim_geometry):
+def detect_assets(claim_geometry, window_bounds=None):
     """
     Detect forest, cropland, water_body, urban, barren_land around a claim.
+    window_bounds: optional EPSG:4326 (minx, miny, maxx, maxy) to fetch (see fetch_index).
 
     Improvements:
       - Higher-res fetch so rivers are not 1px.
       - MNDWI (Green vs SWIR1) + NDWI hybrid for water.
       - Morphology + tiny min_area keep thin rivers.
     """
-    # Indices
-    ndvi_raw, bbox = fetch_index(claim_geometry, EVALSCRIPT_NDVI, "debug_ndvi.png")
-    ndwi_raw, _    = fetch_index(claim_geometry, EVALSCRIPT_NDWI, "debug_ndwi.png")
+    # Issue both Sentinel Hub requests at once (multiband, truecolor); the truecolor
+    # image is only a reference preview, so it is skipped unless debugging.
+    f_multi = _SH_POOL.submit(fetch_index, claim_geometry, EVALSCRIPT_MULTIBAND, "debug_multiband.png",
+                              window_bounds=window_bounds)
+    f_rgb = _SH_POOL.submit(fetch_rgb, claim_geometry, "truecolor_satellite.png") if _DEBUG else None
 
     # Multiband: Blue, Green, Red, NIR, SWIR1
-    multiband, _ = fetch_index(claim_geometry, EVALSCRIPT_MULTIBAND, "debug_multiband.png")
-    blue  = multiband[:, :, 0].astype(np.float32)
-    green = multiband[:, :, 1].astype(np.float32)
-    red   = multiband[:, :, 2].astype(np.float32)
-    nir   = multiband[:, :, 3].astype(np.float32)
-    swir1 = multiband[:, :, 4].astype(np.float32)
-
-    # squeeze single-band arrays
-    ndvi = ndvi_raw[..., 0] if ndvi_raw.ndim == 3 else ndvi_raw
-    ndwi = ndwi_raw[..., 0] if ndwi_raw.ndim == 3 else ndwi_raw
+    multiband, bbox = f_multi.result()
+    # one float32 copy, band-major so every band is a contiguous plane
+    bands = np.ascontiguousarray(np.moveaxis(multiband[:, :, :5], -1, 0), dtype=np.float32)
+    np.multiply(bands, np.float32(1.0 / REFLECTANCE_SCALE), out=bands)  # UINT16 -> reflectance
+    blue, green, red, nir, swir1 = bands
 
     eps = 1e-6
+    den = np.empty_like(nir)  # shared denominator scratch
+
+    # Vegetation (NDVI) and McFeeters NDWI (Green vs NIR)
+    ndvi = _normalized_difference(nir, red, eps, scratch=den)
+    ndwi = _normalized_difference(green, nir, eps, scratch=den)
+    _save_preview(ndvi, "debug_ndvi.png")
+    _save_preview(ndwi, "debug_ndwi.png")
 
     # Built-up (NDBI) and bare soil (BSI)
-    ndbi = (swir1 - nir) / (swir1 + nir + eps)
-    bsi  = ((swir1 + red) - (nir + blue)) / ((swir1 + red) + (nir + blue) + eps)
+    ndbi = _normalized_difference(swir1, nir, eps, scratch=den)
+    sr = np.add(swir1, red)
+    nb = np.add(nir, blue)
+    bsi = _normalized_difference(sr, nb, eps, out=sr, scratch=den)
+    del nb
 
-    save_mask(ndbi, "debug_ndbi.png")
-    save_mask(bsi,  "debug_bsi.png")
+    _save_preview(ndbi, "debug_ndbi.png")
+    _save_preview(bsi,  "debug_bsi.png")
 
     # ---- Water: MNDWI (Xu 2006) + NDWI hybrid ----
-    mndwi = (green - swir1) / (green + swir1 + eps)
-    save_mask(mndwi, "debug_mndwi.png")
-
-    # Looser thresholds to capture rivers + exclude vegetation
-    water_raw = (mndwi > -0.05) | ((ndwi > 0.05) & (ndvi < 0.30) & (bsi < 0.0))
-    water_mask = clean_mask(water_raw.astype(np.uint8), close_iters=2, open_iters=0, dilate_iters=3)
-    save_mask(water_mask, "debug_water_mask.png")
-
-    # Truecolor for reference
-    fetch_rgb(claim_geometry, "truecolor_satellite.png")
+    mndwi = _normalized_difference(green, swir1, eps, scratch=den)
+    _save_preview(mndwi, "debug_mndwi.png")
+
+    # Looser thresholds to capture rivers + exclude vegetation:
+    # (mndwi > -0.05) | ((ndwi > 0.05) & (ndvi < 0.30) & (bsi < 0.0))
+    water_raw = np.greater(ndwi, 0.05)
+    cond = np.empty_like(water_raw)
+    np.logical_and(water_raw, np.less(ndvi, 0.30, out=cond), out=water_raw)
+    np.logical_and(water_raw, np.less(bsi, 0.0, out=cond), out=water_raw)
+    np.logical_or(water_raw, np.greater(mndwi, -0.05, out=cond), out=water_raw)
+    water_mask = clean_mask(water_raw.view(np.uint8), close_iters=2, open_iters=0, dilate_iters=3)
+    _save_preview(water_mask, "debug_water_mask.png")
+
+    # Truecolor for reference (fetched in the background above)
+    if f_rgb is not None:
+        f_rgb.result()
 
     # --- Classification to polygons ---
     geoms, types = [], []
 
+    # Threshold straight into one reused 0/255 uint8 buffer (no bool temporaries);
+    # mask_to_geopolygons consumes it before the next class overwrites it.
+    mask_u8 = np.empty(ndvi.shape, np.uint8)
+
     # Forest
-    for poly in mask_to_geopolygons((ndvi > 0.50).astype(np.uint8), bbox, min_area=200):
+    cv2.compare(ndvi, 0.50, cv2.CMP_GT, mask_u8)
+    for poly in mask_to_geopolygons(mask_u8, bbox, min_area=200):
         geoms.append(poly); types.append("forest")
 
-    # Cropland
-    for poly in mask_to_geopolygons(((ndvi > 0.20) & (ndvi <= 0.50)).astype(np.uint8), bbox, min_area=200):
+    # Cropland: 0.20 < ndvi <= 0.50 (inRange is inclusive on both ends)
+    cv2.inRange(ndvi, float(np.nextafter(np.float32(0.20), np.float32(1.0))), 0.50, mask_u8)
+    for poly in mask_to_geopolygons(mask_u8, bbox, min_area=200):
         geoms.append(poly); types.append("cropland")
 
     # Water (small min_area so thin rivers survive)
@@ -306,11 +451,13 @@ def detect_assets(claim_geometry):
         geoms.append(poly); types.append("water_body")
 
     # Urban
-    for poly in mask_to_geopolygons((ndbi > 0.20).astype(np.uint8), bbox, min_area=200):
+    cv2.compare(ndbi, 0.20, cv2.CMP_GT, mask_u8)
+    for poly in mask_to_geopolygons(mask_u8, bbox, min_area=200):
         geoms.append(poly); types.append("urban")
 
     # Barren
-    for poly in mask_to_geopolygons((bsi > 0.20).astype(np.uint8), bbox, min_area=200):
+    cv2.compare(bsi, 0.20, cv2.CMP_GT, mask_u8)
+    for poly in mask_to_geopolygons(mask_u8, bbox, min_area=200):
         geoms.append(poly); types.append("barren_land")
 
     return gpd.GeoDataFrame({"asset_type": types}, geometry=geoms, crs="EPSG:4326")
@@ -329,3 +476,33 @@ def map_assets_from_satellite_image(claim_gdf):
     asset_gdf = detect_assets(claim_geometry)
     return asset_gdf
 
+
+def map_assets_for_claims(claims_gdf, max_workers=4, window_bounds=None):
+    """
+    Batch form of map_assets_from_satellite_image for many claim points.
+    Detections for different claims overlap on a thread pool (they are Sentinel Hub
+    bound); returns one GeoDataFrame with a 'claim_idx' column holding the
+    claims_gdf index of each asset. Claims whose detection fails are reported and skipped.
+    window_bounds: optional list of EPSG:4326 fetch windows, one per claims_gdf row.
+    """
+    parts = []
+    if not claims_gdf.empty:
+        if window_bounds is None:
+            window_bounds = [None] * len(claims_gdf)
+        # own pool: detect_assets already blocks on _SH_POOL futures
+        with ThreadPoolExecutor(max_workers=max(1, int(max_workers)),
+                                thread_name_prefix="claim-assets") as pool:
+            futures = [(idx, pool.submit(detect_assets, geom, window_bounds=wb))
+                       for idx, geom, wb in zip(claims_gdf.index, claims_gdf.geometry, window_bounds)]
+            for idx, fut in futures:
+                try:
+                    asset_gdf = fut.result()
+                except Exception as exc:
+                    print(f"⚠️ asset detection failed for claim {idx}: {exc}")
+                    continue
+                if not asset_gdf.empty:
+                    parts.append(asset_gdf.assign(claim_idx=idx))
+
+    if not parts:
+        return gpd.GeoDataFrame(columns=["asset_type", "claim_idx", "geometry"], geometry=[], crs="EPSG:4326")
+    return gpd.GeoDataFrame(pd.concat(parts, ignore_index=True), geometry="geometry", crs="EPSG:4326")
@@ -6,11 +6,23 @@ import re
 # Point to installed Tesseract
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
+# Compiled once at import; extract_info_from_image runs per document.
+_COORDS_RE = re.compile(r"(\d+\.\d+)\s*[, ]\s*(\d+\.\d+)")
+# "Name:", "Village:" or "Status:" followed by the rest of that line
+_FIELD_RE = re.compile(r"(Name|Village|Status):([^\r\n\f]*)")
+_FIELD_KEYS = {"Name": "patta_holder", "Village": "village", "Status": "claim_status"}
+
+# LSTM engine only, page treated as one uniform text block (simple printed forms).
+TESSERACT_CONFIG = "--oem 1 --psm 6"
+# Cap the longer side before OCR; full-resolution scans mostly add LSTM time.
+OCR_MAX_SIDE = 2000
+
 def extract_info_from_image(image_path):
     """Extract claim data from a document image using OCR + regex."""
     try:
-        img = Image.open(image_path)
-        text = pytesseract.image_to_string(img)
+        img = Image.open(image_path).convert("L")
+        img.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+        text = pytesseract.image_to_string(img, config=TESSERACT_CONFIG)
 
         # Debug: Show raw OCR output
         print("\n================ OCR RAW TEXT ================")
@@ -24,21 +36,12 @@ def extract_info_from_image(image_path):
             "claim_status": "Unknown"
         }
 
-        # --- Parse fields ---
-        for line in text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-
-            if "Name:" in line:
-                data["patta_holder"] = line.split("Name:")[1].strip()
-            elif "Village:" in line:
-                data["village"] = line.split("Village:")[1].strip()
-            elif "Status:" in line:
-                data["claim_status"] = line.split("Status:")[1].strip()
+        # --- Parse fields (single scan; first label on a line wins, later lines override) ---
+        for m in _FIELD_RE.finditer(text):
+            data[_FIELD_KEYS[m.group(1)]] = m.group(2).strip()
 
         # --- Extract coordinates anywhere in text ---
-        match = re.search(r"(\d+\.\d+)\s*[, ]\s*(\d+\.\d+)", text)
+        match = _COORDS_RE.search(text)
         if match:
             data["coordinates"] = f"{match.group(1)},{match.group(2)}"
 
@@ -1,22 +1,48 @@
 # ai_models/groundwater_offline.py
+import numpy as np
 import pandas as pd
 import math
-from typing import Optional, Dict, Any, List
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
 from pathlib import Path
 
+try:
+    from sklearn.neighbors import BallTree
+except ImportError:  # optional: fall back to a vectorized linear scan
+    BallTree = None
+
+try:
+    import pyarrow  # noqa: F401  (multi-threaded CSV engine + Parquet cache)
+    _HAVE_PYARROW = True
+except ImportError:
+    _HAVE_PYARROW = False
+
 CSV_PATH = Path("sample_data/groundwater_levels.csv")
 
+WELL_COLUMNS = ["StationCode", "Lat", "Lon", "WaterLevel_m_bgl", "Datetime"]
+NUMERIC_COLUMNS = ["Lat", "Lon", "WaterLevel_m_bgl"]
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _haversine_rad(lat0: float, lon0: float, lat_rad: np.ndarray, lon_rad: np.ndarray,
+                   cos_lat_rad: np.ndarray) -> np.ndarray:
+    """
+    Vectorized haversine (km) from one point to arrays of points, all in radians.
+    cos_lat_rad is np.cos(lat_rad), precomputed once per wells table.
+    """
+    a = np.sin((lat_rad - lat0) * 0.5) ** 2 + math.cos(lat0) * cos_lat_rad * np.sin((lon_rad - lon0) * 0.5) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
 
-def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def _haversine(lat1: float, lon1: float, lat2, lon2):
     """
-    Haversine distance in kilometers between two lat/lon points.
+    Haversine distance in kilometers from (lat1, lon1) to (lat2, lon2).
+    lat2/lon2 may be scalars or NumPy arrays; the computation is vectorized.
     """
-    R = 6371.0
-    from math import radians, sin, cos, asin, sqrt
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    return 2 * R * asin(sqrt(a))
+    lat_a = np.radians(lat2)
+    return _haversine_rad(math.radians(lat1), math.radians(lon1), lat_a, np.radians(lon2), np.cos(lat_a))
 
 
 def _load_wells(csv_path: Path = CSV_PATH) -> pd.DataFrame:
@@ -27,23 +53,158 @@ def _load_wells(csv_path: Path = CSV_PATH) -> pd.DataFrame:
     if not csv_path.exists():
         raise FileNotFoundError(f"Groundwater CSV not found: {csv_path}")
 
-    df = pd.read_csv(csv_path)
-    # Normalize column names (strip whitespace)
-    df.rename(columns=lambda c: c.strip(), inplace=True)
+    # Cleaned frame is persisted as a Parquet sidecar; reuse it while it is newer than the CSV
+    parquet_path = csv_path.with_suffix(".parquet")
+    if _HAVE_PYARROW and parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        try:
+            return pd.read_parquet(parquet_path)
+        except Exception:
+            pass  # unreadable cache: rebuild from CSV below
+
+    # Peek at the header so only the needed columns are parsed, with pinned dtypes
+    header = pd.read_csv(csv_path, nrows=0).columns
+    names = {c.strip(): c for c in header}
 
     required = {"Lat", "Lon", "WaterLevel_m_bgl"}
-    if not required.issubset(set(df.columns)):
-        raise ValueError(f"CSV missing required columns. Found: {list(df.columns)}; required: {required}")
+    if not required.issubset(set(names)):
+        raise ValueError(f"CSV missing required columns. Found: {list(names)}; required: {required}")
+
+    usecols = [names[c] for c in WELL_COLUMNS if c in names]
+    read_kw = {"usecols": usecols}
+    if _HAVE_PYARROW:
+        read_kw["engine"] = "pyarrow"
+    try:
+        df = pd.read_csv(csv_path, dtype={names[c]: "float64" for c in NUMERIC_COLUMNS}, **read_kw)
+    except (ValueError, TypeError):
+        # stray non-numeric values: parse untyped and coerce them to NaN
+        df = pd.read_csv(csv_path, **read_kw)
+        for c in NUMERIC_COLUMNS:
+            df[names[c]] = pd.to_numeric(df[names[c]], errors="coerce")
 
-    # Coerce numeric types and drop invalid rows
-    df["Lat"] = pd.to_numeric(df["Lat"], errors="coerce")
-    df["Lon"] = pd.to_numeric(df["Lon"], errors="coerce")
-    df["WaterLevel_m_bgl"] = pd.to_numeric(df["WaterLevel_m_bgl"], errors="coerce")
+    # Normalize column names (strip whitespace)
+    df.rename(columns=lambda c: c.strip(), inplace=True)
 
     df = df.dropna(subset=["Lat", "Lon"]).reset_index(drop=True)
+
+    if _HAVE_PYARROW:
+        try:
+            df.to_parquet(parquet_path, index=False)
+        except Exception:
+            pass  # cache is best-effort (e.g. read-only data dir)
     return df
 
 
+class _WellsCache(NamedTuple):
+    df: pd.DataFrame
+    lat: np.ndarray       # degrees, float32
+    lon: np.ndarray       # degrees, float32
+    lat_rad: np.ndarray   # float32
+    lon_rad: np.ndarray   # float32
+    cos_lat: np.ndarray   # cos(lat_rad), float32
+    tree: Optional[Any]   # BallTree(haversine) over (lat_rad, lon_rad), or None
+
+
+@lru_cache(maxsize=4)
+def _load_wells_cached(path_str: str, mtime: float) -> _WellsCache:
+    """
+    Memoized _load_wells plus lat/lon arrays (degrees, radians), cos(lat) and a
+    haversine BallTree, keyed by path + mtime so an updated CSV is picked up
+    automatically. Callers must not mutate the frame.
+
+    The scan arrays are contiguous float32 (plenty for 5-decimal coordinates and
+    half the memory traffic of the linear scan); the tree is built in float64.
+    """
+    df = _load_wells(Path(path_str))
+    lat64 = df["Lat"].to_numpy(dtype=np.float64)
+    lon64 = df["Lon"].to_numpy(dtype=np.float64)
+    tree = None
+    if BallTree is not None and lat64.size:
+        tree = BallTree(np.column_stack([np.radians(lat64), np.radians(lon64)]), metric="haversine")
+    lat = np.ascontiguousarray(lat64, dtype=np.float32)
+    lon = np.ascontiguousarray(lon64, dtype=np.float32)
+    lat_rad = np.radians(lat)
+    return _WellsCache(df, lat, lon, lat_rad, np.radians(lon), np.cos(lat_rad), tree)
+
+
+def _wells(csv_path: Path = CSV_PATH) -> _WellsCache:
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Groundwater CSV not found: {csv_path}")
+    return _load_wells_cached(str(csv_path.resolve()), csv_path.stat().st_mtime)
+
+
+def _bbox_candidates(w: _WellsCache, lat: float, lon: float, max_km: float) -> np.ndarray:
+    """
+    Indices of wells inside the lat/lon box that encloses the max_km circle.
+    Cheap abs/compare on degrees; the exact haversine filter runs afterwards.
+    """
+    r = max_km / EARTH_RADIUS_KM
+    dlat = math.degrees(r)
+    if dlat >= 90.0:
+        return np.arange(w.lat.size)
+    mask = np.abs(w.lat - lat) <= dlat
+    if abs(lat) + dlat < 90.0:
+        # widest longitude offset of the circle (cap does not reach a pole)
+        dlon = math.degrees(math.asin(min(1.0, math.sin(r) / math.cos(math.radians(lat)))))
+        mask &= np.abs((w.lon - lon + 180.0) % 360.0 - 180.0) <= dlon
+    return np.flatnonzero(mask)
+
+
+def _nearest(w: _WellsCache, lat: float, lon: float, k: int,
+             max_km: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row indices and distances (km) of up to k nearest wells, closest first.
+    Uses the cached BallTree when available, else bbox prefilter + linear scan.
+    """
+    if w.tree is not None:
+        q = np.radians([[lat, lon]])
+        if max_km is None:
+            d, idx = w.tree.query(q, k=min(k, w.lat.size))
+            return idx[0], d[0] * EARTH_RADIUS_KM
+        idx, d = w.tree.query_radius(q, r=float(max_km) / EARTH_RADIUS_KM,
+                                     return_distance=True, sort_results=True)
+        return idx[0][:k], d[0][:k] * EARTH_RADIUS_KM
+
+    if max_km is None:
+        idx = np.arange(w.lat.size)
+        dist = _haversine_rad(math.radians(lat), math.radians(lon), w.lat_rad, w.lon_rad, w.cos_lat)
+    else:
+        # bbox prefilter, then exact haversine only on the survivors
+        idx = _bbox_candidates(w, lat, lon, float(max_km))
+        dist = _haversine_rad(math.radians(lat), math.radians(lon),
+                              w.lat_rad[idx], w.lon_rad[idx], w.cos_lat[idx])
+        keep = dist <= float(max_km)
+        idx, dist = idx[keep], dist[keep]
+
+    if idx.size == 0:
+        return idx, dist
+
+    # O(N) partial selection of the k closest, then order just those k
+    k = min(k, dist.size)
+    top = np.argpartition(dist, k - 1)[:k]
+    top = top[np.argsort(dist[top])]
+    return idx[top], dist[top]
+
+
+def _nearest_batch(w: _WellsCache, lats: np.ndarray, lons: np.ndarray, k: int,
+                   max_km: Optional[float]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    _nearest for many query points: one BallTree call for the whole batch when
+    the tree is available, else the per-point linear scan.
+    """
+    if len(lats) == 0:
+        return []
+    if w.tree is not None:
+        q = np.column_stack([np.radians(lats), np.radians(lons)])
+        if max_km is None:
+            d, idx = w.tree.query(q, k=min(k, w.lat.size))
+            return list(zip(idx, d * EARTH_RADIUS_KM))
+        idx, d = w.tree.query_radius(q, r=float(max_km) / EARTH_RADIUS_KM,
+                                     return_distance=True, sort_results=True)
+        return [(i[:k], dd[:k] * EARTH_RADIUS_KM) for i, dd in zip(idx, d)]
+    return [_nearest(w, float(a), float(b), k, max_km) for a, b in zip(lats, lons)]
+
+
 def groundwater_k_nearest(lat: float, lon: float, k: int = 3, max_km: Optional[float] = 150.0,
                           csv_path: Path = CSV_PATH) -> List[Dict[str, Any]]:
     """
@@ -52,27 +213,18 @@ def groundwater_k_nearest(lat: float, lon: float, k: int = 3, max_km: Optional[f
     Each returned dict contains:
       - station_code, depth_m_bgl (float or None), when, distance_km (float), well_lat, well_lon
     """
-    df = _load_wells(csv_path)
-
-    # Compute distances vectorized
-    df = df.copy()
-    df["dist_km"] = df.apply(lambda r: _haversine(float(lat), float(lon), float(r["Lat"]), float(r["Lon"])), axis=1)
-
-    if max_km is not None:
-        df = df[df["dist_km"] <= float(max_km)]
-
-    if df.empty:
+    w = _wells(csv_path)
+    idx, dist = _nearest(w, float(lat), float(lon), max(1, int(k)), max_km)
+    if idx.size == 0:
         return []
 
-    df = df.sort_values("dist_km").head(max(1, int(k)))
-
     wells: List[Dict[str, Any]] = []
-    for _, r in df.iterrows():
+    for (_, r), d in zip(w.df.iloc[idx].iterrows(), dist):
         wells.append({
             "station_code": str(r.get("StationCode")) if "StationCode" in r.index else None,
             "depth_m_bgl": float(r["WaterLevel_m_bgl"]) if pd.notna(r["WaterLevel_m_bgl"]) else None,
             "when": r.get("Datetime") if "Datetime" in r.index else None,
-            "distance_km": round(float(r["dist_km"]), 3),
+            "distance_km": round(float(d), 3),
             "well_lat": float(r["Lat"]),
             "well_lon": float(r["Lon"]),
         })
@@ -96,15 +248,46 @@ def groundwater_stats(lat: float, lon: float, k: int = 3, max_km: Optional[float
     depths = [w["depth_m_bgl"] for w in wells if w["depth_m_bgl"] is not None]
     avg_depth = round(sum(depths)/len(depths), 2) if depths else None
     min_dist = min(w["distance_km"] for w in wells) if wells else None
+    mean_dist = round(sum(w["distance_km"] for w in wells) / len(wells), 3)
 
     return {
         "avg_depth_m_bgl": avg_depth,
         "min_distance_km": min_dist,
+        "mean_distance_km": mean_dist,
         "k_used": len(wells),
         "samples": wells,
     }
 
 
+def groundwater_stats_batch(lats, lons, k: int = 3, max_km: Optional[float] = 150.0,
+                            csv_path: Path = CSV_PATH) -> List[Optional[Dict[str, Any]]]:
+    """
+    groundwater_stats for many points at once (one k-NN query for the batch).
+    Returns one entry per input point, in order: None where no wells are within
+    max_km, else a dict with avg_depth_m_bgl, min_distance_km, mean_distance_km
+    and k_used (no per-well samples).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    w = _wells(csv_path)
+    depth = w.df["WaterLevel_m_bgl"].to_numpy(dtype=np.float64)
+
+    out: List[Optional[Dict[str, Any]]] = []
+    for idx, dist in _nearest_batch(w, lats, lons, max(1, int(k)), max_km):
+        if idx.size == 0:
+            out.append(None)
+            continue
+        d = depth[idx]
+        d = d[~np.isnan(d)]
+        out.append({
+            "avg_depth_m_bgl": round(float(d.mean()), 2) if d.size else None,
+            "min_distance_km": round(float(dist[0]), 3),
+            "mean_distance_km": round(float(dist.mean()), 3),
+            "k_used": int(idx.size),
+        })
+    return out
+
+
 # ----------------- CLI quick test -----------------
 if __name__ == "__main__":
     import argparse
@@ -1,12 +1,15 @@
 
 # ai_models/map_visualizer.py
-import folium
+import hashlib
+import json
+import os
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import sqlite3
-import webbrowser
-from shapely import wkt
+import shapely
 from ai_models.groundwater_offline import groundwater_k_nearest
+from backend.database import geoms_from_db
 
 DB_PATH = "fra_claims.db"
 OUTPUT_PATH = "sample_data/claim_assets_map.html"
@@ -20,16 +23,33 @@ ASSET_COLORS = {
     "barren_land": "gray"
 }
 
+# Grid (degrees) asset outlines are snapped to before embedding in the map HTML;
+# 1e-6 deg is ~0.1 m, well below the 10 m Sentinel-2 pixel the polygons come from.
+DISPLAY_PRECISION_DEG = 1e-6
+
+# Marker/layer options shared by every map. Keyword dicts rather than Icon
+# instances: a folium element can only belong to one marker.
+CLAIM_ICON_KW = dict(color="red", icon="info-sign")
+GW_ICON_KW = dict(color="blue", icon="tint")
+NEARBY_WELL_KW = dict(radius=4, color="blue", fill=True, fill_opacity=0.7, tooltip="Nearby GW well")
+WELL_POPUP_FMT = ("Station: {station_code}<br>Depth: {depth_m_bgl} m bgl<br>"
+                  "Measured: {when}<br>Distance: {distance_km} km")
+SUMMARY_DIV_HTML = '<div style="font-size:12px;background:white;padding:4px;border-radius:4px">{}</div>'
+
+
+def _asset_style(feature):
+    return {"color": feature["properties"]["color"], "weight": 2, "fillOpacity": 0.4}
+
 def _ensure_gdf_geometry(asset_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
-    """If geometry column contains WKT strings, convert to shapely geometry objects."""
+    """If geometry column contains WKT strings or WKB bytes, convert to shapely geometry objects."""
     if asset_gdf is None:
         return gpd.GeoDataFrame(columns=["asset_type", "geometry"], geometry=[], crs="EPSG:4326")
     gdf = asset_gdf.copy()
     if "geometry" in gdf.columns and gdf.geometry.dtype == object:
-        # If values are WKT strings, convert; if already geometry, leave as-is.
+        # If values are WKT/WKB, convert; if already geometry, leave as-is.
         sample = gdf["geometry"].iloc[0] if len(gdf) > 0 else None
-        if isinstance(sample, str):
-            gdf["geometry"] = gdf["geometry"].apply(lambda x: wkt.loads(x) if x is not None else None)
+        if isinstance(sample, (str, bytes)):
+            gdf["geometry"] = geoms_from_db(gdf["geometry"])
     # ensure GeoDataFrame and CRS
     if not isinstance(gdf, gpd.GeoDataFrame):
         gdf = gpd.GeoDataFrame(gdf, geometry="geometry", crs="EPSG:4326")
@@ -37,14 +57,29 @@ def _ensure_gdf_geometry(asset_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
         gdf.set_crs(epsg=4326, inplace=True)
     return gdf
 
+def _map_inputs_digest(lat, lon, patta_holder, village, asset_types, geoms, wells):
+    """Hash of everything that ends up in the map HTML (plus styling and folium version)."""
+    import folium
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((lat, lon, str(patta_holder), str(village),
+                   ASSET_COLORS, DISPLAY_PRECISION_DEG, folium.__version__)).encode())
+    h.update("\x00".join(map(str, asset_types)).encode())
+    for wkb in shapely.to_wkb(geoms):
+        h.update(wkb if wkb is not None else b"\x00")
+    h.update(repr(wells).encode())
+    return h.hexdigest()
+
 def generate_claim_asset_map(claim_gdf, asset_gdf, output_path=OUTPUT_PATH,
-                             gw_k=3, gw_max_km=100.0):
+                             gw_k=3, gw_max_km=100.0, open_browser=False):
     """
     Generates an interactive folium map showing:
     - Claim location (marker)
     - Detected assets (polygons)
     - Nearest groundwater wells (up to gw_k)
+    Set open_browser=True to open the saved map in the default browser.
     """
+    # folium (branca, jinja2) is only paid for by callers that actually draw a map
+    import folium
 
     if claim_gdf is None or claim_gdf.empty:
         raise ValueError("claim_gdf is empty or None")
@@ -56,6 +91,33 @@ def generate_claim_asset_map(claim_gdf, asset_gdf, output_path=OUTPUT_PATH,
     patta_holder = claim_gdf.get("patta_holder", pd.Series(["Unknown"])).iloc[0]
     village = claim_gdf.get("village", pd.Series(["Unknown"])).iloc[0]
 
+    # Prepare assets GeoDataFrame
+    asset_gdf = _ensure_gdf_geometry(asset_gdf)
+    if "asset_type" in asset_gdf.columns:
+        asset_types = asset_gdf["asset_type"].to_numpy()
+    else:
+        asset_types = ["unknown"] * len(asset_gdf)
+
+    # Nearest groundwater wells (up to gw_k)
+    try:
+        wells = groundwater_k_nearest(lat, lon, k=gw_k, max_km=gw_max_km)
+    except Exception as e:
+        wells = []
+        print(f"⚠️ groundwater lookup failed: {e}")
+
+    # Skip rebuilding the HTML when the same inputs produced the existing file
+    digest = _map_inputs_digest(lat, lon, patta_holder, village, asset_types,
+                                asset_gdf.geometry.values, wells)
+    digest_path = output_path + ".sha"
+    try:
+        if os.path.exists(output_path):
+            with open(digest_path) as f:
+                if f.read().strip() == digest:
+                    print(f"🗺️ Claim + assets map unchanged at {output_path}")
+                    return output_path
+    except OSError:
+        pass
+
     m = folium.Map(location=[lat, lon], zoom_start=14)
 
     # Add claim marker
@@ -63,94 +125,77 @@ def generate_claim_asset_map(claim_gdf, asset_gdf, output_path=OUTPUT_PATH,
         location=[lat, lon],
         popup=f"<b>Claim:</b> {patta_holder} <br/><b>Village:</b> {village}",
         tooltip="Claim Location",
-        icon=folium.Icon(color="red", icon="info-sign")
+        icon=folium.Icon(**CLAIM_ICON_KW)
     ).add_to(m)
 
-    # Prepare assets GeoDataFrame
-    asset_gdf = _ensure_gdf_geometry(asset_gdf)
-
-    # Add asset polygons with colors
+    # Add asset polygons as one colored FeatureCollection layer
     if not asset_gdf.empty:
-        for _, row in asset_gdf.iterrows():
-            geom = row.get("geometry")
-            if geom is None:
-                continue
-            asset_type = row.get("asset_type", "unknown")
-            color = ASSET_COLORS.get(asset_type, "black")
-
-            # style_function closure captures color per feature
+        # snap to the display grid so the embedded GeoJSON doesn't carry 15-digit coordinates
+        display_geoms = shapely.set_precision(asset_gdf.geometry.values, DISPLAY_PRECISION_DEG)
+        keep = ~(shapely.is_missing(display_geoms) | shapely.is_empty(display_geoms))
+        # serialize all geometries to GeoJSON text in one vectorized call
+        features = [
+            '{"type": "Feature", "geometry": %s, "properties": %s}' % (
+                geom_json,
+                json.dumps({"asset_type": str(asset_type), "color": ASSET_COLORS.get(asset_type, "black")}),
+            )
+            for asset_type, geom_json in zip(np.asarray(asset_types)[keep],
+                                             shapely.to_geojson(display_geoms[keep]))
+        ]
+        if features:
             folium.GeoJson(
-                geom.__geo_interface__ if hasattr(geom, "__geo_interface__") else geom,
-                name=asset_type,
-                tooltip=str(asset_type),
-                style_function=(lambda c: (lambda feature: {
-                    "color": c,
-                    "weight": 2,
-                    "fillOpacity": 0.4
-                }))(color)
+                '{"type": "FeatureCollection", "features": [%s]}' % ", ".join(features),
+                name="assets",
+                tooltip=folium.GeoJsonTooltip(fields=["asset_type"], labels=False),
+                style_function=_asset_style
             ).add_to(m)
 
     # Add nearest groundwater wells (up to gw_k)
-    try:
-        wells = groundwater_k_nearest(lat, lon, k=gw_k, max_km=gw_max_km)
-    except Exception as e:
-        wells = []
-        print(f"⚠️ groundwater lookup failed: {e}")
-
     if wells:
         # Add markers for each sampled well; highlight the closest
         wells_sorted = sorted(wells, key=lambda w: w["distance_km"])
         closest = wells_sorted[0]
 
         # Popup for the closest well
-        gw_popup = (
-            f"<b>Nearest GW Well</b><br>"
-            f"Station: {closest.get('station_code')}<br>"
-            f"Depth: {closest.get('depth_m_bgl')} m bgl<br>"
-            f"Measured: {closest.get('when')}<br>"
-            f"Distance: {closest.get('distance_km')} km"
-        )
+        gw_popup = "<b>Nearest GW Well</b><br>" + WELL_POPUP_FMT.format_map(closest)
         folium.Marker(
             location=[closest["well_lat"], closest["well_lon"]],
             popup=gw_popup,
             tooltip="Nearest GW Well",
-            icon=folium.Icon(color="blue", icon="tint")
+            icon=folium.Icon(**GW_ICON_KW)
         ).add_to(m)
 
         # Add other wells (if any) as smaller markers
         for w in wells_sorted[1:]:
-            popup = (
-                f"Station: {w.get('station_code')}<br>"
-                f"Depth: {w.get('depth_m_bgl')} m bgl<br>"
-                f"Measured: {w.get('when')}<br>"
-                f"Distance: {w.get('distance_km')} km"
-            )
             folium.CircleMarker(
                 location=[w["well_lat"], w["well_lon"]],
-                radius=4,
-                color="blue",
-                fill=True,
-                fill_opacity=0.7,
-                popup=popup,
-                tooltip="Nearby GW well"
+                popup=WELL_POPUP_FMT.format_map(w),
+                **NEARBY_WELL_KW
             ).add_to(m)
 
         # Add a small legend item as a marker with summary
         summary_html = f"GW sample: {len(wells_sorted)} wells, closest {closest['distance_km']} km, avg depth TBD"
         folium.map.Marker(
             [lat, lon],
-            icon=folium.DivIcon(html=f"""<div style="font-size:12px;background:white;padding:4px;border-radius:4px">{summary_html}</div>""")
+            icon=folium.DivIcon(html=SUMMARY_DIV_HTML.format(summary_html))
         ).add_to(m)
 
     # Save and open map
     m.save(output_path)
+    try:
+        with open(digest_path, "w") as f:
+            f.write(digest)
+    except OSError:
+        pass
     print(f"🗺️ Claim + assets map saved at {output_path}")
 
     # try opening in default browser (non-blocking)
-    try:
-        webbrowser.open(output_path)
-    except Exception:
-        pass
+    if open_browser:
+        try:
+            import webbrowser
+            webbrowser.open(output_path)
+        except Exception:
+            pass
 
     return output_path
 
@@ -165,19 +210,19 @@ if __name__ == "__main__":
     if claims.empty:
         print("⚠️ No claims found in DB.")
     else:
-        # Convert assets geometry WKT -> shapely geometry if needed
+        # Convert assets geometry WKB/WKT -> shapely geometry if needed
         if "geometry" in assets.columns:
-            assets["geometry"] = assets["geometry"].apply(lambda g: wkt.loads(g) if isinstance(g, str) else g)
+            assets["geometry"] = geoms_from_db(assets["geometry"])
             assets_gdf = gpd.GeoDataFrame(assets, geometry="geometry", crs="EPSG:4326")
         else:
             assets_gdf = gpd.GeoDataFrame(columns=list(assets.columns)+["geometry"], geometry=[], crs="EPSG:4326")
 
         # Build claim GeoDataFrame (expects 'coordinates' as "lat,lon")
-        coords_split = claims["coordinates"].str.split(",", expand=True)
+        coords = claims["coordinates"].str.split(",", expand=True).astype(float)
         claims_gdf = gpd.GeoDataFrame(
             claims,
-            geometry=gpd.points_from_xy(coords_split[1].astype(float), coords_split[0].astype(float)),
+            geometry=gpd.points_from_xy(coords[1], coords[0]),
             crs="EPSG:4326"
         )
 
-        generate_claim_asset_map(claims_gdf, assets_gdf)
+        generate_claim_asset_map(claims_gdf, assets_gdf, open_browser=True)
@@ -1,17 +1,120 @@
 # asset_evaluator.py
+import inspect
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
-from shapely import wkt
-from ai_models.groundwater_offline import groundwater_stats
-
-# import the mapper implemented at ai_models/asset_mapping.py
-from ai_models.asset_mapping import map_assets_from_satellite_image
+import shapely
+from pyproj import Transformer
+from ai_models.groundwater_offline import groundwater_stats_batch
 
 DB_PATH = "fra_claims.db"
 
 
+# Candidate schemes, in the column order of _scheme_scores. The old
+# "PM Fasal Bima Yojana (detailed)" alias always tied with and ranked behind
+# PMFBY, then collapsed into it, so it never changed the output and is gone.
+SCHEMES = (
+    "PM-KISAN", "PMFBY", "Soil Health Card", "NMSA",
+    "Jal Jeevan Mission", "PMKSY", "MGNREGA Water Works",
+    "PMAY-G", "Saubhagya (electrification)", "PM Ujjwala", "PMGSY (rural roads)",
+    "MGNREGA Land Dev", "RKVY", "ITDP/TSP",
+    "MFP Scheme (TRIFED)", "Van Dhan Yojana", "Green India Mission",
+    "Jal Shakti (check dams/borewells)", "NRLM (SHG / livelihoods)", "Skill India",
+    "Minor Irrigation / Micro-irrigation",
+)
+
+# tie-breaker for equal scores: custom priority list (higher priority earlier), then SCHEMES order
+PRIORITY_ORDER = [
+    "PM-KISAN", "Jal Jeevan Mission", "PMAY-G", "PMFBY",
+    "MGNREGA Water Works", "MFP Scheme (TRIFED)", "NRLM (SHG / livelihoods)",
+    "MGNREGA Land Dev", "PMKSY", "Van Dhan Yojana", "NMSA", "Soil Health Card"
+]
+_TIE_KEY = np.array([
+    (PRIORITY_ORDER.index(name) if name in PRIORITY_ORDER else len(PRIORITY_ORDER)) * len(SCHEMES) + j
+    for j, name in enumerate(SCHEMES)
+])
+
+
+_TIE_SPAN = int(_TIE_KEY.max()) + 1
+
+# Single-feature rules as a threshold table: score = HI if x >= T_HI else LO if x >= T_LO else ELSE.
+# Strict ">" thresholds are stored as the next float up; one-tier rules repeat the tier.
+_VEG, _WAT, _URB, _BAR, _GW = range(5)
+_GT = lambda t: float(np.nextafter(t, np.inf))
+_TIERED = [
+    # scheme                 feature  T_HI      HI   T_LO      LO   ELSE
+    ("PM-KISAN",              _VEG,   2.0,      2.0, 0.5,      1.0, 0.0),
+    ("PMFBY",                 _VEG,   1.0,      1.5, 0.2,      0.5, 0.0),
+    ("Soil Health Card",      _VEG,   0.5,      1.0, 0.5,      1.0, 0.0),
+    ("NMSA",                  _VEG,   1.0,      1.2, _GT(0.0), 0.4, 0.0),
+    ("PMAY-G",                _URB,   1.0,      2.0, 0.2,      1.0, 0.0),
+    ("Saubhagya (electrification)", _URB, _GT(0.0), 1.0, _GT(0.0), 1.0, 0.3),
+    ("PM Ujjwala",            _URB,   _GT(0.0), 0.8, _GT(0.0), 0.8, 0.4),
+    ("MGNREGA Land Dev",      _BAR,   _GT(0.2), 1.5, _GT(0.05), 0.5, 0.0),
+    ("MFP Scheme (TRIFED)",   _VEG,   1.0,      1.8, 1.0,      1.8, 0.5),
+    ("Van Dhan Yojana",       _VEG,   1.0,      1.5, 1.0,      1.5, 0.4),
+    ("Green India Mission",   _VEG,   1.0,      1.2, 1.0,      1.2, 0.2),
+]
+_T_COL = np.array([SCHEMES.index(r[0]) for r in _TIERED])
+_T_FEATURE = np.array([r[1] for r in _TIERED])
+_T_HI, _S_HI, _T_LO, _S_LO, _S_ELSE = (np.array([r[c] for r in _TIERED]) for c in range(2, 7))
+
+
+def _scheme_scores(veg, wat, urb, bar, gw, gw_known):
+    """
+    Score every scheme for arrays of claims; returns an (N, len(SCHEMES)) array.
+    veg/wat/urb/bar are areas in ha, gw is depth in m bgl and gw_known masks the
+    claims that have a groundwater value (a known NaN depth is neither ok nor deep).
+    """
+    features = np.column_stack([veg, wat, urb, bar, gw])
+    scores = np.empty((features.shape[0], len(SCHEMES)))
+
+    # table-driven single-feature rules, all at once
+    vals = features[:, _T_FEATURE]
+    scores[:, _T_COL] = np.where(vals >= _T_HI, _S_HI, np.where(vals >= _T_LO, _S_LO, _S_ELSE))
+
+    # rules that combine features
+    gw_ok = gw_known & (gw <= 15)
+    gw_deep = gw_known & (gw > 15)
+    gw_poor = ~gw_known | gw_deep       # unknown or deep
+    poor_land = (veg < 2.0) & (wat == 0.0) & gw_poor
+    combined = {
+        "Jal Jeevan Mission": np.where(wat > 0.0, 2.0, np.where(gw_ok, 1.0, 0.2)),
+        "PMKSY": np.where((wat > 0.0) | gw_ok | (veg >= 2.0), 1.5, 0.2),
+        "MGNREGA Water Works": np.where((wat > 0.0) | (bar > 0.1) | gw_deep, 1.4, 0.3),
+        "PMGSY (rural roads)": np.where((urb > 0.0) | (veg > 1.0), 1.0, 0.2),
+        "RKVY": np.where((bar > 0.1) | (veg > 0.5), 1.0, 0.0),
+        "ITDP/TSP": np.where((veg < 2.0) & ((urb > 0.0) | (bar > 0.0)), 1.0, 0.4),
+        # safety-net / livelihood diversification when land/water poor
+        "Jal Shakti (check dams/borewells)": np.where(poor_land, 1.8,
+                                                      np.where((wat == 0.0) & gw_poor, 0.6, 0.2)),
+        "NRLM (SHG / livelihoods)": np.where(poor_land, 1.6, np.where(veg < 2.0, 0.6, 0.2)),
+        "Skill India": np.where(poor_land, 1.0, 0.4),
+        "Minor Irrigation / Micro-irrigation": np.where((veg >= 1.0) & ((wat > 0.0) | gw_ok), 1.0, 0.3),
+    }
+    for name, col in combined.items():
+        scores[:, SCHEMES.index(name)] = col
+    return scores
+
+
+def _top_schemes(scores, max_schemes):
+    """Top `max_schemes` positive-score scheme names for each row of a score matrix."""
+    k = min(int(max_schemes), len(SCHEMES))
+    if k <= 0:
+        return [[] for _ in range(scores.shape[0])]
+
+    # scores are in tenths, so (score desc, _TIE_KEY asc) packs into one unique integer key
+    key = np.rint(scores * 10).astype(np.int64) * _TIE_SPAN - _TIE_KEY
+    top = np.argpartition(-key, k - 1, axis=-1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(key, top, axis=-1), axis=-1), axis=-1)
+    positive = np.take_along_axis(scores, top, axis=-1) > 0.0
+    return [[SCHEMES[j] for j in row[ok]] for row, ok in zip(top, positive)]
+
+
 def recommend_schemes(row, max_schemes=4):
     """
     Priority recommender that scores candidate schemes using simple weights
@@ -31,163 +134,240 @@ def recommend_schemes(row, max_schemes=4):
     bar = row.get("barren_area(ha)") if isinstance(row, dict) else row["barren_area(ha)"]
     gw  = row.get("groundwater_depth(m_bgl)") if isinstance(row, dict) else row["groundwater_depth(m_bgl)"]
 
-    # normalize None -> 0 for numeric comparison where appropriate
-    veg = 0.0 if veg is None else float(veg)
-    wat = 0.0 if wat is None else float(wat)
-    urb = 0.0 if urb is None else float(urb)
-    bar = 0.0 if bar is None else float(bar)
-    # gw: None stays None (we need to check existence)
-    
-    # scoring dict
-    scores = {}
-
-    # --- Agriculture & Farmer support ---
-    # PM-KISAN (high priority if meaningful cropland/vegetation)
-    scores["PM-KISAN"] = 2.0 if veg >= 2.0 else (1.0 if veg >= 0.5 else 0.0)
-    # PMFBY (crop insurance) — needs cropland
-    scores["PMFBY"] = 1.5 if veg >= 1.0 else 0.5 if veg >= 0.2 else 0.0
-    # Soil Health / NMSA (agri improvements)
-    scores["Soil Health Card"] = 1.0 if veg >= 0.5 else 0.0
-    scores["NMSA"] = 1.2 if veg >= 1.0 else 0.4 if veg > 0 else 0.0
-
-    # --- Water & Irrigation ---
-    # Jal Jeevan Mission (piped water) — surface water presence raises priority
-    scores["Jal Jeevan Mission"] = 2.0 if wat > 0.0 else (1.0 if (gw is not None and gw <= 15) else 0.2)
-    # PMKSY irrigation support
-    scores["PMKSY"] = 1.5 if (wat > 0.0 or (gw is not None and gw <= 15) or veg >= 2.0) else 0.2
-    # MGNREGA Water Works
-    scores["MGNREGA Water Works"] = 1.4 if (wat > 0.0 or bar > 0.1 or (gw is not None and gw > 15)) else 0.3
-
-    # --- Housing & Basic Services (if settlements detected) ---
-    scores["PMAY-G"] = 2.0 if urb >= 1.0 else (1.0 if urb >= 0.2 else 0.0)
-    scores["Saubhagya (electrification)"] = 1.0 if urb > 0.0 else 0.3
-    scores["PM Ujjwala"] = 0.8 if urb > 0.0 else 0.4
-    scores["PMGSY (rural roads)"] = 1.0 if urb > 0.0 or veg > 1.0 else 0.2
-
-    # --- Land reclamation & livelihood ---
-    scores["MGNREGA Land Dev"] = 1.5 if bar > 0.2 else 0.5 if bar > 0.05 else 0.0
-    scores["RKVY"] = 1.0 if bar > 0.1 or veg > 0.5 else 0.0
-    scores["ITDP/TSP"] = 1.0 if veg < 2.0 and (urb > 0.0 or bar > 0.0) else 0.4
-
-    # --- Special forest/tribal schemes ---
-    scores["MFP Scheme (TRIFED)"] = 1.8 if veg >= 1.0 else 0.5
-    scores["Van Dhan Yojana"] = 1.5 if veg >= 1.0 else 0.4
-    scores["Green India Mission"] = 1.2 if veg >= 1.0 else 0.2
-
-    # --- Safety-net / livelihood diversification when land/water poor ---
-    poor_land = (veg < 2.0) and (wat == 0.0) and (gw is None or gw > 15)
-    if poor_land:
-        scores["Jal Shakti (check dams/borewells)"] = 1.8
-        scores["NRLM (SHG / livelihoods)"] = 1.6
-        scores["Skill India"] = 1.0
-    else:
-        scores["Jal Shakti (check dams/borewells)"] = 0.6 if (wat == 0.0 and (gw is None or gw > 15)) else 0.2
-        scores["NRLM (SHG / livelihoods)"] = 0.6 if veg < 2.0 else 0.2
-        scores["Skill India"] = 0.4
-
-    # --- Small extras (electable when high combined score) ---
-    scores["PM Fasal Bima Yojana (detailed)"] = scores.get("PMFBY", 0.0)  # aliasing to keep options
-    scores["Minor Irrigation / Micro-irrigation"] = 1.0 if veg >= 1.0 and (wat > 0.0 or (gw is not None and gw <= 15)) else 0.3
+    # normalize None -> 0 for the areas; gw: None is unknown (we need to check existence)
+    features = [np.array([0.0 if v is None else float(v)]) for v in (veg, wat, urb, bar)]
+    features.append(np.array([np.nan if gw is None else float(gw)]))
+    features.append(np.array([gw is not None]))
+    return _top_schemes(_scheme_scores(*features), max_schemes)[0]
 
-    # Remove any zero-score schemes and sort by score desc
-    scored = [(scheme, float(score)) for scheme, score in scores.items() if score and score > 0.0]
 
-    if not scored:
+def recommend_schemes_batch(df, max_schemes=4, gw_known=None):
+    """
+    recommend_schemes for every row of an evaluate_assets-style DataFrame, scored in one pass.
+    gw_known defaults to "groundwater value is not None", as recommend_schemes reads a row;
+    pass it explicitly when unknown depths were stored as NaN (a float column can't hold None).
+    """
+    if df.empty:
         return []
+    areas = df[["vegetation_area(ha)", "water_area(ha)", "urban_area(ha)", "barren_area(ha)"]]
+    areas = areas.astype(float).fillna(0.0).to_numpy()
+    gw_raw = df["groundwater_depth(m_bgl)"].to_numpy(dtype=object)
+    gw_known = ~np.equal(gw_raw, None) if gw_known is None else np.asarray(gw_known, dtype=bool)
+    gw = np.where(gw_known, gw_raw, np.nan).astype(float)
+    return _top_schemes(_scheme_scores(*areas.T, gw, gw_known), max_schemes)
 
-    # sort by score desc, tie-breaker: custom priority list (higher priority earlier)
-    priority_order = [
-        "PM-KISAN", "Jal Jeevan Mission", "PMAY-G", "PMFBY",
-        "MGNREGA Water Works", "MFP Scheme (TRIFED)", "NRLM (SHG / livelihoods)",
-        "MGNREGA Land Dev", "PMKSY", "Van Dhan Yojana", "NMSA", "Soil Health Card"
-    ]
-    def sort_key(item):
-        name, s = item
-        # higher score first; if tie, priority_order index (lower is better)
-        try:
-            pr = priority_order.index(name)
-        except ValueError:
-            pr = len(priority_order) + 10
-        return (-s, pr)
-
-    scored.sort(key=sort_key)
-
-    # pick top N unique canonical names (avoid alias duplicates)
-    chosen = []
-    seen_canonical = set()
-    alias_map = {
-        "PM Fasal Bima Yojana (detailed)": "PMFBY",
-    }
 
-    for name, s in scored:
-        canonical = alias_map.get(name, name)
-        if canonical in seen_canonical:
-            continue
-        chosen.append(canonical)
-        seen_canonical.add(canonical)
-        if len(chosen) >= max_schemes:
-            break
+ASSET_TYPES = ["cropland", "forest", "water_body", "urban", "barren_land"]
+
+
+def _empty_assets_gdf():
+    return gpd.GeoDataFrame(columns=["asset_type", "geometry"], geometry=[], crs="EPSG:4326")
+
+
+def _parse_claim_coordinates(coords):
+    """
+    Parse a Series of "lat,lon" strings into two float arrays.
+    Rows that are missing, malformed or not exactly two numbers become NaN.
+    """
+    parts = coords.astype("string").str.split(",", expand=True)
+    if parts.shape[1] < 2:
+        nan = np.full(len(coords), np.nan)
+        return nan, nan.copy()
+    lat = pd.to_numeric(parts[0].str.strip(), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    lon = pd.to_numeric(parts[1].str.strip(), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    if parts.shape[1] > 2:
+        extra = parts.iloc[:, 2:].notna().any(axis=1).to_numpy()
+        lat[extra] = np.nan
+        lon[extra] = np.nan
+    return lat, lon
+
+
+def _run_mapper(mapper, claim_point, mapper_kwargs, label):
+    """Call the asset mapper for one claim; never raises, returns an EPSG:4326 GeoDataFrame."""
+    # Some mappers may not accept kwargs, so fall back gracefully.
+    try:
+        if mapper_kwargs:
+            try:
+                detected_gdf = mapper(claim_point, **mapper_kwargs)
+            except TypeError:
+                detected_gdf = mapper(claim_point)
+        else:
+            detected_gdf = mapper(claim_point)
+    except Exception as exc:
+        print(f"WARNING: asset mapper failed for claim {label}: {exc}")
+        return _empty_assets_gdf()
+
+    if detected_gdf is None or detected_gdf.empty:
+        return _empty_assets_gdf()
+    if detected_gdf.crs is None:
+        return detected_gdf.set_crs(epsg=4326)
+    return detected_gdf.to_crs(epsg=4326)
 
-    return chosen
+
+@lru_cache(maxsize=1024)
+def _local_transformer(lat, lon):
+    """4326 -> azimuthal equidistant metres centred on (lat, lon); true distances from the claim."""
+    return Transformer.from_crs(
+        "EPSG:4326", f"+proj=aeqd +lat_0={lat} +lon_0={lon} +datum=WGS84 +units=m", always_xy=True
+    )
+
+
+def _project_local(geoms, lat, lon):
+    """Reproject an array of EPSG:4326 geometries into the claim-centred metric frame."""
+    tr = _local_transformer(round(lat, 2), round(lon, 2))
+    return shapely.transform(geoms, lambda xy: np.column_stack(tr.transform(xy[:, 0], xy[:, 1])))
+
+
+def _claim_windows(claim_points, buffer_m):
+    """EPSG:4326 bounds of each claim's buffer, i.e. the only imagery the area sums can use."""
+    windows = []
+    for pt in claim_points.geometry:
+        tr = _local_transformer(round(pt.y, 2), round(pt.x, 2))
+        cx, cy = tr.transform(pt.x, pt.y)
+        ring = np.asarray(shapely.buffer(shapely.Point(cx, cy), buffer_m, quad_segs=16).exterior.coords)
+        lon, lat = tr.transform(ring[:, 0], ring[:, 1], direction="INVERSE")
+        windows.append((float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())))
+    return windows
+
+
+def _asset_areas_by_claim(claim_points, detected_parts, buffer_m):
+    """
+    Clip every detected asset to its own claim's buffer and sum areas (ha) in one pass.
+
+    claim_points   : GeoDataFrame of claim points (EPSG:4326) indexed by claim row
+    detected_parts : list of mapper GeoDataFrames (EPSG:4326), each with a 'claim_idx' column
+    Returns a DataFrame indexed like claim_points with one column per ASSET_TYPES entry.
+    """
+    empty = pd.DataFrame(0.0, index=claim_points.index, columns=ASSET_TYPES)
+    if not detected_parts:
+        return empty
+
+    detected = pd.concat(detected_parts, ignore_index=True)
+    detected = detected[detected["claim_idx"].isin(claim_points.index)]
+    if detected.empty:
+        return empty
+    claim_idx = detected["claim_idx"].to_numpy()
+    geoms_4326 = np.asarray(detected.geometry.values)
+
+    # each claim's assets (and its buffer) go into a local equidistant frame centred on the claim,
+    # so the buffer radius and areas are in true metres; assets pair with their own claim only
+    geoms = np.empty(len(detected), dtype=object)
+    claim_buffers = np.empty(len(detected), dtype=object)
+    points = claim_points.geometry
+    for cid, pos in pd.Series(claim_idx).groupby(claim_idx).indices.items():
+        pt = points.loc[cid]
+        geoms[pos] = _project_local(geoms_4326[pos], pt.y, pt.x)
+        centre = _project_local(np.array([pt], dtype=object), pt.y, pt.x)[0]
+        claim_buffers[pos] = shapely.buffer(centre, buffer_m, quad_segs=16)
+
+    # assets outside their claim buffer never reach the GEOS intersection
+    hit = shapely.intersects(claim_buffers, geoms)
+    if not hit.any():
+        return empty
+    geoms, claim_buffers, claim_idx = geoms[hit], claim_buffers[hit], claim_idx[hit]
+    asset_type = detected["asset_type"].to_numpy()[hit]
+
+    # valid assets lying wholly inside their buffer keep their own area (prepared containment
+    # test); only the rest go through the GEOS intersection
+    shapely.prepare(claim_buffers)
+    clipped = geoms.copy()
+    edge = ~(shapely.contains_properly(claim_buffers, geoms) & shapely.is_valid(geoms))
+    try:
+        clipped[edge] = shapely.intersection(geoms[edge], claim_buffers[edge])
+    except Exception:
+        # contour polygons can self-intersect; repair and retry
+        clipped[edge] = shapely.intersection(shapely.make_valid(geoms[edge]), claim_buffers[edge])
+
+    area_ha = pd.Series(shapely.area(clipped) / 10000.0)
+    sums = area_ha.groupby([claim_idx, asset_type]).sum()
+    return (sums.unstack(fill_value=0.0)
+                .reindex(index=claim_points.index, columns=ASSET_TYPES, fill_value=0.0))
 
 
 def evaluate_assets(buffer_km=1.0,
                     groundwater_max_depth_m=15.0,
                     gw_k=3,
                     gw_max_km=150.0,
-                    mapper_kwargs=None):
+                    mapper_kwargs=None,
+                    mapper_workers=4,
+                    buffer_windows=False):
     """
     Evaluate FRA claims by area of assets around a claim and groundwater.
 
     mapper_kwargs: optional dict forwarded to mapper if it accepts them.
+    mapper_workers: number of claims whose mapper calls run concurrently.
+    buffer_windows: opt-in; fetch imagery for each claim's buffer bbox instead of the
+        mapper's fixed box around the point (batched mapper only). Smaller requests,
+        but a different image extent, so detected areas can differ.
     """
+    # import the mapper implemented at ai_models/asset_mapping.py here, so importing this
+    # module (e.g. for recommend_schemes) doesn't pull in Sentinel Hub / OpenCV
+    from ai_models.asset_mapping import map_assets_from_satellite_image, map_assets_for_claims
+
     if mapper_kwargs is None:
         mapper_kwargs = {}
 
-    # load claims and (optionally) precomputed assets table
+    # load claims (assets are detected per run by the mapper, so fra_assets is not read here)
     conn = sqlite3.connect(DB_PATH)
     claims = pd.read_sql("SELECT * FROM fra_claims;", conn)
-    try:
-        assets = pd.read_sql("SELECT * FROM fra_assets;", conn)
-    except Exception:
-        assets = pd.DataFrame()
     conn.close()
 
-    # prepare assets_gdf just for compatibility (not used by mapper)
-    if assets.empty:
-        assets_gdf = gpd.GeoDataFrame(columns=["asset_type", "geometry"], geometry=[], crs="EPSG:4326")
-    else:
-        if "geometry" in assets.columns:
-            assets = assets.copy()
-            assets["geometry"] = assets["geometry"].apply(lambda g: wkt.loads(g) if pd.notna(g) else None)
-            assets_gdf = gpd.GeoDataFrame(assets, geometry="geometry", crs="EPSG:4326")
-        else:
-            assets_gdf = gpd.GeoDataFrame(columns=list(assets.columns) + ["geometry"], geometry=[], crs="EPSG:4326")
-
     results = []
 
     if claims.empty:
         return pd.DataFrame(results)
 
-    for _, claim in claims.iterrows():
-        coords_text = claim.get("coordinates", "")
-        try:
-            parts = [c.strip() for c in coords_text.split(",")]
-            if len(parts) != 2:
-                raise ValueError("invalid coords")
-            # original data used "lat,lon" — handle that first, otherwise try reversed
-            lat = float(parts[0]); lon = float(parts[1])
-        except Exception:
-            try:
-                lon = float(parts[0]); lat = float(parts[1])
-            except Exception:
-                lat = lon = None
-
-        if lat is None or lon is None:
+    # --- pass 1: parse "lat,lon" for all claims at once, then run the mapper per valid claim ---
+    lat_arr, lon_arr = _parse_claim_coordinates(claims["coordinates"])
+    valid = ~(np.isnan(lat_arr) | np.isnan(lon_arr))
+
+    # (points_from_xy expects lon, lat)
+    claim_points = gpd.GeoDataFrame(
+        claims.loc[valid, ["patta_holder", "village"]],
+        geometry=gpd.points_from_xy(lon_arr[valid], lat_arr[valid]),
+        crs="EPSG:4326"
+    )
+
+    # one batched mapper call for all claims (tagged with claim_idx), unless mapper_kwargs
+    # has keys the batch entry point doesn't take: those go to the per-claim mapper below
+    batch_params = inspect.signature(map_assets_for_claims).parameters
+    batch_ok = (set(mapper_kwargs) <= set(batch_params)
+                or any(p.kind is inspect.Parameter.VAR_KEYWORD for p in batch_params.values()))
+    if batch_ok:
+        # fetch imagery for each claim's buffer bbox only (not a fixed box around the point)
+        # one argument dict, caller's mapper_kwargs last: they override, never collide
+        kwargs = {"max_workers": mapper_workers}
+        if buffer_windows:
+            kwargs["window_bounds"] = _claim_windows(claim_points, float(buffer_km) * 1000.0)
+        kwargs.update(mapper_kwargs)
+        detected = map_assets_for_claims(claim_points, **kwargs)
+        detected_parts = [detected] if not detected.empty else []
+    else:
+        # mapper calls are network-bound (Sentinel Hub), so overlap them on a few threads
+        claim_frames = [claim_points.iloc[[j]] for j in range(len(claim_points))]
+        labels = [f"{claims.at[i, 'patta_holder']} ({claims.at[i, 'coordinates']})" for i in claim_points.index]
+        with ThreadPoolExecutor(max_workers=max(1, int(mapper_workers))) as pool:
+            detected_all = list(pool.map(_run_mapper, repeat(map_assets_from_satellite_image),
+                                         claim_frames, repeat(mapper_kwargs), labels))
+        detected_parts = [detected_gdf.assign(claim_idx=i)
+                          for i, detected_gdf in zip(claim_points.index, detected_all)
+                          if not detected_gdf.empty]
+
+    # --- pass 2: clip all detected assets to their claim buffers and sum areas at once ---
+    area_table = _asset_areas_by_claim(claim_points, detected_parts, float(buffer_km) * 1000.0)
+
+    # groundwater for all valid claims in one k-NN query
+    gw_by_claim = dict(zip(claim_points.index,
+                           groundwater_stats_batch(lat_arr[valid], lon_arr[valid],
+                                                   k=gw_k, max_km=gw_max_km)))
+
+    # --- pass 3: decision rule and schemes, in claim order ---
+    for pos, (i, claim) in enumerate(claims.iterrows()):
+        if not valid[pos]:
             results.append({
                 "patta_holder": claim.get("patta_holder"),
                 "village": claim.get("village"),
-                "coordinates": coords_text,
+                "coordinates": claim.get("coordinates", ""),
                 "claim_status": claim.get("claim_status"),
                 "vegetation_area(ha)": None,
                 "water_area(ha)": None,
@@ -201,70 +381,13 @@ def evaluate_assets(buffer_km=1.0,
             })
             continue
 
-        # build claim point GeoDataFrame (Point expects lon, lat)
-        claim_point = gpd.GeoDataFrame(
-            [{"patta_holder": claim.get("patta_holder"), "village": claim.get("village")}],
-            geometry=[Point(lon, lat)],
-            crs="EPSG:4326"
-        )
-
-        # buffer in meters (EPSG:3857)
-        claim_3857 = claim_point.to_crs(epsg=3857)
-        buffer_m = float(buffer_km) * 1000.0
-        buff_geom_3857 = claim_3857.geometry.iloc[0].buffer(buffer_m)
-
-        # call mapper. Some mappers may not accept kwargs, so fall back gracefully.
-        try:
-            if mapper_kwargs:
-                try:
-                    detected_gdf = map_assets_from_satellite_image(claim_point, **mapper_kwargs)
-                except TypeError:
-                    detected_gdf = map_assets_from_satellite_image(claim_point)
-            else:
-                detected_gdf = map_assets_from_satellite_image(claim_point)
-        except Exception as exc:
-            print(f"WARNING: asset mapper failed for claim {claim.get('patta_holder')} ({coords_text}): {exc}")
-            detected_gdf = gpd.GeoDataFrame(columns=["asset_type", "geometry"], geometry=[], crs="EPSG:4326")
-
-        # default areas
-        farm_area_ha = forest_area_ha = water_area_ha = urban_area_ha = barren_area_ha = 0.0
-
-        if detected_gdf is not None and not detected_gdf.empty:
-            if detected_gdf.crs is None:
-                detected_gdf = detected_gdf.set_crs(epsg=4326)
-            try:
-                detected_3857 = detected_gdf.to_crs(epsg=3857).copy()
-            except Exception:
-                detected_3857 = detected_gdf.copy()
-                detected_3857.set_crs(epsg=4326, inplace=True)
-                detected_3857 = detected_3857.to_crs(epsg=3857)
-
-            try:
-                detected_3857["geometry"] = detected_3857["geometry"].intersection(buff_geom_3857)
-            except Exception:
-                pass
-
-            detected_3857 = detected_3857[~detected_3857.geometry.is_empty & detected_3857.geometry.notna()].copy()
-            if not detected_3857.empty:
-                detected_3857["area_m2"] = detected_3857.geometry.area
-                detected_3857["area_ha"] = detected_3857["area_m2"] / 10000.0
-
-                def area_sum(asset_type):
-                    subset = detected_3857[detected_3857["asset_type"] == asset_type]
-                    if subset.empty:
-                        return 0.0
-                    return float(subset["area_ha"].sum())
-
-                farm_area_ha = area_sum("cropland")
-                forest_area_ha = area_sum("forest")
-                water_area_ha = area_sum("water_body")
-                urban_area_ha = area_sum("urban")
-                barren_area_ha = area_sum("barren_land")
+        farm_area_ha, forest_area_ha, water_area_ha, urban_area_ha, barren_area_ha = (
+            area_table.loc[i].tolist())
 
         vegetation_area = farm_area_ha + forest_area_ha
 
         # groundwater
-        gw_info = groundwater_stats(lat, lon, k=gw_k, max_km=gw_max_km)
+        gw_info = gw_by_claim[i]
         if gw_info:
             depth_m = gw_info.get("avg_depth_m_bgl")
             mean_dist_km = gw_info.get("mean_distance_km")
@@ -314,12 +437,14 @@ def evaluate_assets(buffer_km=1.0,
             "gw_k_used": int(k_used),
             "evaluation": evaluation
         }
-
-        # add scheme recommendations
-        result_row["recommended_schemes"] = recommend_schemes(result_row)
         results.append(result_row)
 
-    return pd.DataFrame(results)
+    # scheme recommendations for all valid claims in one scoring pass
+    out = pd.DataFrame(results)
+    gw_known = np.array([r["groundwater_depth(m_bgl)"] is not None for r in results], dtype=bool)
+    recommended = iter(recommend_schemes_batch(out.loc[valid], gw_known=gw_known[valid]))
+    out["recommended_schemes"] = [next(recommended) if ok else [] for ok in valid]
+    return out
 
 
 if __name__ == "__main__":
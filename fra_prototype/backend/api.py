@@ -1,16 +1,25 @@
 # backend/api.py
+import io
+import os
 import sqlite3
+import threading
 import json
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-from shapely import wkt
+import shapely
 from fastapi import FastAPI, Query
 from fastapi.responses import JSONResponse, HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.database import geoms_from_db
+
 DB_PATH = "fra_claims.db"
+ASSET_TYPES = ["cropland", "forest", "water_body", "urban", "barren_land"]
+EMPTY_FC = '{"type": "FeatureCollection", "features": []}'
 
 app = FastAPI(title="FRA Atlas API")
 
@@ -23,26 +32,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------- DB connection ----------
+_local = threading.local()
+
+def _db_file_id():
+    try:
+        st = os.stat(DB_PATH)
+        return (st.st_dev, st.st_ino)
+    except OSError:
+        return None
+
+def _get_conn() -> sqlite3.Connection:
+    """
+    Per-thread SQLite connection, opened once and reused across requests.
+    Reopened if the DB file is replaced (e.g. run_initial_setup recreating it).
+    """
+    file_id = _db_file_id()
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.file_id != file_id:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-65536")       # 64 MiB page cache
+        conn.execute("PRAGMA mmap_size=268435456")     # 256 MiB memory-mapped reads
+        _local.conn = conn
+        _local.file_id = _db_file_id()
+    return conn
+
+@app.on_event("startup")
+def _enable_wal():
+    # WAL is persistent in the DB file: readers no longer block on a writer
+    _get_conn().execute("PRAGMA journal_mode=WAL")
+
 # ---------- Helpers ----------
-def _sql_df(sql: str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql(sql, conn)
-    conn.close()
-    return df
+def _sql_df(sql: str, params: tuple = ()) -> pd.DataFrame:
+    return pd.read_sql(sql, _get_conn(), params=params)
+
+def _where(sql: str, where: Optional[str]) -> str:
+    return f"{sql} WHERE {where}" if where else sql
 
-def _claims_df() -> pd.DataFrame:
-    return _sql_df("SELECT * FROM fra_claims")
+def _claims_df(where: Optional[str] = None, params: tuple = ()) -> pd.DataFrame:
+    return _sql_df(_where("SELECT * FROM fra_claims", where), params)
 
-def _assets_df() -> pd.DataFrame:
-    return _sql_df("SELECT * FROM fra_assets")
+def _assets_df(where: Optional[str] = None, params: tuple = ()) -> pd.DataFrame:
+    return _sql_df(_where("SELECT * FROM fra_assets", where), params)
 
 def _assets_gdf(df: pd.DataFrame) -> gpd.GeoDataFrame:
     if df.empty:
         return gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
     df = df.copy()
-    df["geometry"] = df["geometry"].apply(wkt.loads)
+    df["geometry"] = geoms_from_db(df["geometry"])
     return gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
 
+_assets_cache: Dict[str, Any] = {}
+
+def _db_mtime() -> float:
+    mtimes = [os.path.getmtime(p) for p in (DB_PATH, DB_PATH + "-wal") if os.path.exists(p)]
+    return max(mtimes) if mtimes else 0.0
+
+def _all_assets_gdf() -> gpd.GeoDataFrame:
+    """Parsed fra_assets table, reused until the DB (or its WAL) is modified."""
+    key = _db_mtime()
+    entry = _assets_cache.get("assets")
+    if entry is None or entry[0] != key:
+        entry = (key, _assets_gdf(_assets_df()))
+        _assets_cache["assets"] = entry
+    return entry[1]
+
 def _points_from_coordinates(df: pd.DataFrame) -> gpd.GeoDataFrame:
     if df.empty:
         return gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
@@ -54,24 +111,34 @@ def _points_from_coordinates(df: pd.DataFrame) -> gpd.GeoDataFrame:
     gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["lon"], df["lat"]), crs="EPSG:4326")
     return gdf
 
+def _to_geojson(gdf: gpd.GeoDataFrame) -> str:
+    if gdf.empty:
+        return EMPTY_FC
+    # bbox only when some geometry exists (otherwise it would be NaN, which is not valid JSON)
+    return gdf.to_json(show_bbox=bool(gdf.geometry.notna().any()))
+
+def _geojson_response(body: str) -> Response:
+    # GeoJSON text from GeoDataFrame.to_json, sent as-is (no dict walk + json.dumps per request)
+    return Response(content=body, media_type="application/geo+json")
+
 # ---------- Dashboard ----------
 @app.get("/summary")
 def summary():
     claims = _claims_df()
-    assets = _assets_df()
+    assets = _all_assets_gdf()
 
     total_claims = len(claims)
     granted = int((claims["claim_status"].str.lower() == "granted").sum()) if not claims.empty else 0
     pending = total_claims - granted
 
     if not assets.empty:
-        gdf = _assets_gdf(assets).to_crs(epsg=3857)
-        areas = {}
-        for t in ["cropland", "forest", "water_body", "urban", "barren_land"]:
-            a = gdf[gdf["asset_type"] == t].area.sum() / 10_000
-            areas[t] = round(float(a), 2)
+        gdf = assets.to_crs(epsg=3857)
+        # one vectorized area pass, then one groupby over asset_type
+        area_ha = pd.Series(shapely.area(np.asarray(gdf.geometry.values)) / 10_000)
+        sums = area_ha.groupby(gdf["asset_type"].to_numpy()).sum()
+        areas = {t: round(float(sums.get(t, 0.0)), 2) for t in ASSET_TYPES}
     else:
-        areas = {t: 0.0 for t in ["cropland", "forest", "water_body", "urban", "barren_land"]}
+        areas = {t: 0.0 for t in ASSET_TYPES}
 
     return {
         "claims": total_claims,
@@ -83,56 +150,110 @@ def summary():
 # ---------- GeoJSON feeds (native) ----------
 @app.get("/claims_geojson")
 def claims_geojson(status: Optional[str] = None, village: Optional[str] = None):
-    df = _claims_df()
+    if status:
+        df = _claims_df("lower(claim_status) = lower(?)", (status,))
+    else:
+        df = _claims_df()
     if df.empty:
-        return JSONResponse({"type": "FeatureCollection", "features": []})
+        return _geojson_response(EMPTY_FC)
     gdf = _points_from_coordinates(df)
-    if status:
-        gdf = gdf[gdf["claim_status"].str.lower() == status.lower()]
     if village:
         gdf = gdf[gdf["village"].str.contains(village, case=False, na=False)]
-    return JSONResponse(gdf.__geo_interface__)
+    return _geojson_response(_to_geojson(gdf))
 
 @app.get("/assets_geojson")
 def assets_geojson(asset_type: Optional[str] = None, village: Optional[str] = None):
-    df = _assets_df()
-    if df.empty:
-        return JSONResponse({"type": "FeatureCollection", "features": []})
     if asset_type:
-        df = df[df["asset_type"] == asset_type]
+        gdf = _assets_gdf(_assets_df("asset_type = ?", (asset_type,)))
+    else:
+        gdf = _all_assets_gdf()
+    if gdf.empty:
+        return _geojson_response(EMPTY_FC)
     if village:
-        df = df[df["village"].str.contains(village, case=False, na=False)]
+        gdf = gdf[gdf["village"].str.contains(village, case=False, na=False)]
+    return _geojson_response(_to_geojson(gdf))
+
+@app.get("/assets_bbox")
+def assets_bbox(minx: float, miny: float, maxx: float, maxy: float,
+                asset_type: Optional[str] = None):
+    # R*Tree narrows candidates by bounding box before any WKT is parsed
+    sql = """
+        SELECT a.* FROM fra_assets a
+        JOIN fra_assets_rtree r ON a.id = r.id
+        WHERE r.minx <= ? AND r.maxx >= ? AND r.miny <= ? AND r.maxy >= ?
+    """
+    params = (maxx, minx, maxy, miny)
+    if asset_type:
+        sql += " AND a.asset_type = ?"
+        params += (asset_type,)
+    try:
+        df = _sql_df(sql, params)
+    except pd.errors.DatabaseError as e:  # pandas wraps the sqlite3 error
+        if not isinstance(e.__cause__, sqlite3.OperationalError):
+            raise
+        # DB built before fra_assets_rtree existed: filter the parsed assets on their bounds
+        return _geojson_response(_to_geojson(_assets_in_bbox(minx, miny, maxx, maxy, asset_type)))
+    if df.empty:
+        return _geojson_response(EMPTY_FC)
     gdf = _assets_gdf(df)
-    return JSONResponse(gdf.__geo_interface__)
+    return _geojson_response(_to_geojson(gdf))
+
+def _assets_in_bbox(minx: float, miny: float, maxx: float, maxy: float,
+                    asset_type: Optional[str] = None) -> gpd.GeoDataFrame:
+    gdf = _all_assets_gdf()
+    if gdf.empty:
+        return gdf
+    if asset_type:
+        gdf = gdf[gdf["asset_type"] == asset_type]
+    b = shapely.bounds(np.asarray(gdf.geometry.values))  # NaN for missing geometry: never matches
+    hit = (b[:, 0] <= maxx) & (b[:, 2] >= minx) & (b[:, 1] <= maxy) & (b[:, 3] >= miny)
+    return gdf[hit]
 
 # ---------- COMPAT routes for Streamlit (expects /api/...) ----------
 @app.get("/api/villages")
 def api_villages():
-    df = _claims_df()
-    v = sorted([x for x in df["village"].dropna().unique().tolist()]) if not df.empty else []
+    df = _sql_df("SELECT DISTINCT village FROM fra_claims WHERE village IS NOT NULL")
+    v = sorted(df["village"].tolist())
     return [{"village": x} for x in v]
 
+def _village_gdf(table: str, village: str) -> gpd.GeoDataFrame:
+    if table == "fra_claims":
+        return _points_from_coordinates(_claims_df("lower(village) = lower(?)", (village,)))
+    gdf = _assets_gdf(_assets_df("lower(village) = lower(?)", (village,)))
+    if "asset_type" in gdf.columns:
+        gdf["asset_type"] = gdf["asset_type"].astype("category")
+    return gdf
+
+@lru_cache(maxsize=64)
+def _village_features(table: str, village: str, db_mtime: float) -> str:
+    """Per-village GeoJSON text; db_mtime in the key drops stale entries after a DB write."""
+    return _to_geojson(_village_gdf(table, village))
+
+@lru_cache(maxsize=64)
+def _village_parquet(table: str, village: str, db_mtime: float) -> bytes:
+    """Per-village GeoParquet (zstd, WKB geometry) bytes; cached like _village_features."""
+    buf = io.BytesIO()
+    _village_gdf(table, village).to_parquet(buf, compression="zstd")
+    return buf.getvalue()
+
 @app.get("/api/claims/{village}")
 def api_claims_by_village(village: str):
-    df = _claims_df()
-    if df.empty:
-        return JSONResponse({"type": "FeatureCollection", "features": []})
-    dfv = df[df["village"].str.lower() == village.lower()]
-    if dfv.empty:
-        return JSONResponse({"type": "FeatureCollection", "features": []})
-    gdf = _points_from_coordinates(dfv)
-    return JSONResponse(gdf.__geo_interface__)
+    return _geojson_response(_village_features("fra_claims", village, _db_mtime()))
 
 @app.get("/api/assets/{village}")
 def api_assets_by_village(village: str):
-    df = _assets_df()
-    if df.empty:
-        return JSONResponse({"type": "FeatureCollection", "features": []})
-    dfv = df[df["village"].str.lower() == village.lower()]
-    if dfv.empty:
-        return JSONResponse({"type": "FeatureCollection", "features": []})
-    gdf = _assets_gdf(dfv)
-    return JSONResponse(gdf.__geo_interface__)
+    return _geojson_response(_village_features("fra_assets", village, _db_mtime()))
+
+# Binary variants: GeoParquet keeps dtypes and decodes geometry with one from_wkb call
+@app.get("/api/parquet/claims/{village}")
+def api_claims_parquet(village: str):
+    return Response(content=_village_parquet("fra_claims", village, _db_mtime()),
+                    media_type="application/vnd.apache.parquet")
+
+@app.get("/api/parquet/assets/{village}")
+def api_assets_parquet(village: str):
+    return Response(content=_village_parquet("fra_assets", village, _db_mtime()),
+                    media_type="application/vnd.apache.parquet")
 
 # ---------- Home / Atlas ----------
 @app.get("/")
@@ -143,9 +264,11 @@ def home():
           <li><a href="/summary">/summary</a></li>
           <li><a href="/claims_geojson">/claims_geojson</a></li>
           <li><a href="/assets_geojson">/assets_geojson</a></li>
+          <li><a href="/assets_bbox?minx=77&amp;miny=12&amp;maxx=78&amp;maxy=13">/assets_bbox</a></li>
           <li><a href="/api/villages">/api/villages</a> (compat)</li>
           <li><a href="/api/claims/YourVillage">/api/claims/&lt;village&gt;</a> (compat)</li>
           <li><a href="/api/assets/YourVillage">/api/assets/&lt;village&gt;</a> (compat)</li>
+          <li>/api/parquet/claims/&lt;village&gt;, /api/parquet/assets/&lt;village&gt; (GeoParquet)</li>
         </ul>
     </body></html>"""
     return HTMLResponse(html)
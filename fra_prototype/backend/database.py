@@ -1,14 +1,19 @@
 # backend/database.py
 import sqlite3
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
 import os
 
 DB_PATH = "fra_claims.db"
 
 def create_database():
     """Create SQLite database with FRA claims and assets tables (fresh)."""
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
+    # drop the DB together with any WAL/shared-memory files left by a WAL-mode reader
+    for path in (DB_PATH, DB_PATH + "-wal", DB_PATH + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
 
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -21,7 +26,7 @@ def create_database():
             village TEXT,
             coordinates TEXT,  -- "lat,lon"
             claim_status TEXT,
-            geometry TEXT       -- WKT of claim point (optional)
+            geometry BLOB       -- WKB of claim point (optional)
         )
     """)
 
@@ -32,27 +37,106 @@ def create_database():
             claim_id INTEGER,
             asset_type TEXT,
             village TEXT,
-            geometry TEXT,
+            geometry BLOB,      -- WKB
             FOREIGN KEY (claim_id) REFERENCES fra_claims(id)
         )
     """)
 
+    # Spatial index over asset bounding boxes (filled by save_data_to_db)
+    cur.execute("""
+        CREATE VIRTUAL TABLE fra_assets_rtree USING rtree(
+            id, minx, maxx, miny, maxy
+        )
+    """)
+
+    # Lookup indexes for the API's village / asset_type filters
+    cur.execute("CREATE INDEX idx_claims_village ON fra_claims(lower(village))")
+    cur.execute("CREATE INDEX idx_assets_village ON fra_assets(lower(village))")
+    cur.execute("CREATE INDEX idx_assets_type ON fra_assets(asset_type)")
+
     conn.commit()
     conn.close()
     print("✅ Standard SQLite database created.")
 
-def save_data_to_db(gdf, table_name):
-    """Save a GeoDataFrame to SQLite as WKT geometry."""
+def save_data_to_db(gdf, table_name, conn=None):
+    """
+    Save a GeoDataFrame to SQLite with WKB (BLOB) geometry.
+    conn: optional open connection; the rows then join the caller's transaction
+    (the caller commits). Without it a private connection is opened and committed.
+    """
     if gdf is None or gdf.empty:
         print(f"ℹ️ No rows to save for '{table_name}'.")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    df = gdf.copy()
+    df = pd.DataFrame(gdf)  # plain frame: the geometry column becomes raw WKB
 
     if "geometry" in df.columns:
-        df["geometry"] = df["geometry"].apply(lambda geom: geom.wkt if geom is not None else None)
+        geoms = df["geometry"].to_numpy(dtype=object, copy=True)
+        geoms[pd.isna(geoms)] = None
+        df["geometry"] = shapely.to_wkb(geoms)
 
-    df.to_sql(table_name, conn, if_exists="append", index=False)
-    conn.close()
+    # column-wise tolist() gives plain Python values sqlite3 can bind; NaN -> NULL
+    columns = list(df.columns)
+    values = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in columns]
+    placeholders = ", ".join("?" * len(columns))
+    sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("PRAGMA synchronous=OFF")  # this connection only; it is closed after the load
+    try:
+        # one transaction for the rows and their R*Tree entries
+        if table_name == "fra_assets" and "geometry" in gdf.columns:
+            _ensure_assets_rtree(conn)
+            # executemany() drops RETURNING rows, so asset rows go one by one to get their ids
+            ids = [conn.execute(sql + " RETURNING id", row).fetchone()[0] for row in zip(*values)]
+            _index_asset_bounds(conn, ids, gdf.geometry)
+        else:
+            conn.executemany(sql, zip(*values))
+        if own_conn:
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
     print(f"💾 Data saved to table '{table_name}'.")
+
+def geoms_from_db(values):
+    """
+    Geometry column read back from the DB -> object array of shapely geometries.
+    Decodes WKB blobs (save_data_to_db) and WKT text (older DBs); NULL becomes None.
+    """
+    arr = pd.Series(values).to_numpy(dtype=object, copy=True)
+    arr[pd.isna(arr)] = None
+    is_wkb = np.fromiter((isinstance(v, (bytes, memoryview)) for v in arr), dtype=bool, count=len(arr))
+    is_wkt = np.fromiter((isinstance(v, str) for v in arr), dtype=bool, count=len(arr))
+    arr[is_wkb] = shapely.from_wkb(arr[is_wkb])
+    arr[is_wkt] = shapely.from_wkt(arr[is_wkt])
+    return arr
+
+def _ensure_assets_rtree(conn):
+    """
+    Create fra_assets_rtree on DBs made before it existed, indexing the asset rows
+    already there so bbox queries keep seeing them.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fra_assets_rtree'").fetchone()
+    if exists:
+        return
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS fra_assets_rtree USING rtree(
+            id, minx, maxx, miny, maxy
+        )
+    """)
+    old = pd.read_sql("SELECT id, geometry FROM fra_assets", conn)
+    _index_asset_bounds(conn, old["id"].tolist(), geoms_from_db(old["geometry"]))
+
+def _index_asset_bounds(conn, ids, geoms):
+    """Add bbox entries to fra_assets_rtree for the asset rows `ids` with geometries `geoms`."""
+    bounds = shapely.bounds(np.asarray(geoms, dtype=object))
+    ok = ~np.isnan(bounds).any(axis=1)
+    rows = [
+        (i, b[0], b[2], b[1], b[3])
+        for i, b, keep in zip(ids, bounds.tolist(), ok) if keep
+    ]
+    conn.executemany("INSERT INTO fra_assets_rtree VALUES (?, ?, ?, ?, ?)", rows)
@@ -1,6 +1,9 @@
 # backend/scheme_engine.py
 from typing import Dict, List, Tuple
 
+import numpy as np
+import pandas as pd
+
 """
 This is a simple, explainable rule engine that:
 - reads computed metrics per-claim (areas, groundwater),
@@ -33,80 +36,109 @@ def recommend(row: Dict) -> Tuple[List[Dict], float]:
       - list of recommendations: [{scheme, reason, priority(0-100)}]
       - overall_priority: single float (0..100)
     """
-    veg = float(row.get("vegetation_area(ha)", 0) or 0)
-    water = float(row.get("water_area(ha)", 0) or 0)
-    barren = float(row.get("barren_area(ha)", 0) or 0)
-    urban = float(row.get("urban_area(ha)", 0) or 0)
-    gw_depth = row.get("groundwater_depth(m_bgl)")
-    gw_dist = row.get("gw_distance_to_well_km")
+    # one rule table: the single-row case runs through recommend_batch
+    out = recommend_batch(pd.DataFrame([row]))
+    return out["recommendations"].iloc[0], float(out["overall_priority"].iloc[0])
 
-    gw_known = (gw_depth is not None)
-    gw_ok = gw_known and (gw_depth <= CONFIG["gw_ok_m"])
+# ---------- Batch version ----------
+def score_band_arr(x: np.ndarray, lo: float, hi: float, invert: bool = False) -> np.ndarray:
+    """Array form of score_band (NaN maps to 1.0, as max/min do in the scalar version)."""
+    if hi == lo:
+        return np.zeros(len(x))
+    t = np.clip((x - lo) / (hi - lo), 0.0, 1.0)
+    t[np.isnan(t)] = 1.0
+    return (1.0 - t) if invert else t
 
-    # ---- Base needs scoring (0..100) ----
-    # Needs score increases if water is low, groundwater is deep, vegetation is low, barren is high
-    water_need = 1.0 - score_band(water, 0.0, 0.5)            # 0ha->need=1, ≥0.5ha->need≈0
-    gw_need    = 0.0 if gw_ok else (0.7 if gw_known else 0.5) # if unknown: mid need
-    veg_need   = 1.0 - score_band(veg, 0.0, 5.0)              # <5ha => higher need
-    barren_need= score_band(barren, 0.0, 5.0)                 # more barren => higher need
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Raw column values as objects (None where the column is missing)."""
+    if name not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    return df[name].to_numpy(dtype=object)
 
-    needs_score = (0.35*water_need + 0.35*gw_need + 0.20*veg_need + 0.10*barren_need)
-    overall_priority = round(needs_score * 100, 1)
+def _as_float(raw: np.ndarray, none_value: float) -> np.ndarray:
+    vals = raw.copy()
+    vals[np.equal(raw, None)] = none_value
+    return vals.astype(float)
 
-    # ---- Scheme rules (examples; adjust per policy as needed) ----
-    recs: List[Dict] = []
+def recommend_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rule engine over every row of `df` at once (recommend() is the one-row case).
+    Output: DataFrame aligned to df.index with columns
+      - recommendations: list of {scheme, reason, priority}
+      - overall_priority: float (0..100)
+    """
+    veg = _as_float(_column(df, "vegetation_area(ha)"), 0.0)
+    water = _as_float(_column(df, "water_area(ha)"), 0.0)
+    barren = _as_float(_column(df, "barren_area(ha)"), 0.0)
+    gw_raw = _column(df, "groundwater_depth(m_bgl)")
+    dist_raw = _column(df, "gw_distance_to_well_km")
 
-    # 1) Jal Jeevan Mission / Local Water Infra
-    if (water < CONFIG["water_min_ha"]) or (gw_known and gw_depth > CONFIG["gw_ok_m"]):
-        reason = []
-        if water < CONFIG["water_min_ha"]:
-            reason.append(f"surface water low ({water:.2f} ha)")
-        if gw_known and gw_depth > CONFIG["gw_ok_m"]:
-            reason.append(f"groundwater deep ({gw_depth:.1f} m bgl)")
-        if not gw_known:
-            reason.append("groundwater unknown")
-        pr = min(95, overall_priority + 10)
-        recs.append({
-            "scheme": "Rural Water Infra (e.g., Jal Jeevan Mission works/MGNREGA water conservation)",
-            "reason": "; ".join(reason),
-            "priority": pr
-        })
+    gw_known = ~np.equal(gw_raw, None)
+    gw_depth = _as_float(gw_raw, np.nan)
+    gw_ok = gw_known & (gw_depth <= CONFIG["gw_ok_m"])
+    gw_deep = gw_known & (gw_depth > CONFIG["gw_ok_m"])
 
-    # 2) Land Development (MGNREGA/Watershed)
-    if barren > 0.2:
-        pr = min(90, overall_priority + 5)
-        recs.append({
-            "scheme": "MGNREGA Watershed/Soil & Moisture Conservation",
-            "reason": f"barren land {barren:.2f} ha; recommend contour trenching, farm ponds",
-            "priority": pr
-        })
+    # ---- Base needs scoring, whole batch ----
+    water_need = 1.0 - score_band_arr(water, 0.0, 0.5)
+    gw_need = np.where(gw_ok, 0.0, np.where(gw_known, 0.7, 0.5))
+    veg_need = 1.0 - score_band_arr(veg, 0.0, 5.0)
+    barren_need = score_band_arr(barren, 0.0, 5.0)
 
-    # 3) Livelihood / Agroforestry (CSS / State Missions)
-    if veg >= CONFIG["veg_min_ha"]:
-        pr = min(85, overall_priority)
-        recs.append({
-            "scheme": "Agroforestry / Allied livelihood support (NHB/Horticulture/State Mission)",
-            "reason": f"adequate vegetation base ({veg:.2f} ha) for diversification",
-            "priority": pr
-        })
+    needs_score = (0.35*water_need + 0.35*gw_need + 0.20*veg_need + 0.10*barren_need)
+    overall = np.round(needs_score * 100, 1)
 
-    # 4) Convergence flag (DAJGUA placeholder)
-    if (water < CONFIG["water_min_ha"]) or (not gw_ok):
-        pr = min(88, overall_priority + 5)
-        recs.append({
-            "scheme": "District Convergence (multi-dept) – water/irrigation priority",
-            "reason": "combine line departments to address water stress",
-            "priority": pr
-        })
+    # ---- Scheme rule masks ----
+    water_low = water < CONFIG["water_min_ha"]
+    m_water = water_low | gw_deep
+    m_land = barren > 0.2
+    m_agro = veg >= CONFIG["veg_min_ha"]
+    m_conv = water_low | ~gw_ok
+    m_far = _as_float(dist_raw, np.nan) > CONFIG["gw_far_km_flag"]
 
-    # warn on far groundwater station
-    if gw_dist and gw_dist > CONFIG["gw_far_km_flag"]:
-        recs.append({
-            "scheme": "Data gap note",
-            "reason": f"nearest groundwater station is far ({gw_dist} km) – prioritize local survey",
-            "priority": 50
-        })
+    all_recs = []
+    for i, pr in enumerate(overall.tolist()):
+        recs: List[Dict] = []
+        if m_water[i]:
+            reason = []
+            if water_low[i]:
+                reason.append(f"surface water low ({water[i]:.2f} ha)")
+            if gw_deep[i]:
+                reason.append(f"groundwater deep ({gw_depth[i]:.1f} m bgl)")
+            if not gw_known[i]:
+                reason.append("groundwater unknown")
+            recs.append({
+                "scheme": "Rural Water Infra (e.g., Jal Jeevan Mission works/MGNREGA water conservation)",
+                "reason": "; ".join(reason),
+                "priority": min(95, pr + 10)
+            })
+        if m_land[i]:
+            recs.append({
+                "scheme": "MGNREGA Watershed/Soil & Moisture Conservation",
+                "reason": f"barren land {barren[i]:.2f} ha; recommend contour trenching, farm ponds",
+                "priority": min(90, pr + 5)
+            })
+        if m_agro[i]:
+            recs.append({
+                "scheme": "Agroforestry / Allied livelihood support (NHB/Horticulture/State Mission)",
+                "reason": f"adequate vegetation base ({veg[i]:.2f} ha) for diversification",
+                "priority": min(85, pr)
+            })
+        if m_conv[i]:
+            recs.append({
+                "scheme": "District Convergence (multi-dept) – water/irrigation priority",
+                "reason": "combine line departments to address water stress",
+                "priority": min(88, pr + 5)
+            })
+        if m_far[i]:
+            recs.append({
+                "scheme": "Data gap note",
+                "reason": f"nearest groundwater station is far ({dist_raw[i]} km) – prioritize local survey",
+                "priority": 50
+            })
+        recs.sort(key=lambda x: x["priority"], reverse=True)
+        all_recs.append(recs)
 
-    # sort recommendations by priority
-    recs.sort(key=lambda x: x["priority"], reverse=True)
-    return recs, overall_priority
+    return pd.DataFrame(
+        {"recommendations": all_recs, "overall_priority": overall},
+        index=df.index,
+    )
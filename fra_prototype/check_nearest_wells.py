@@ -7,47 +7,124 @@ Usage:
   python check_nearest_wells.py --lat 13.13 --lon 78.12 --n 10
 """
 
+import os
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 import math
 import argparse
 import sys
+from pathlib import Path
+
+from ai_models.groundwater_offline import _load_wells
+
+try:
+    from sklearn.neighbors import BallTree
+except ImportError:  # optional: fall back to the vectorized linear scan
+    BallTree = None
 
 CSV_PATH = "sample_data/groundwater_levels.csv"
 
-def haversine(lat1, lon1, lat2, lon2):
+OUTPUT_COLUMNS = ["StationCode", "Lat", "Lon", "WaterLevel_m_bgl", "Datetime"]
+
+def _haversine_rad(lat1_r, lon1_r, lat2_r, lon2_r, cos_lat2):
+    """Great-circle distance in km from one point to arrays of points, all in radians."""
     R = 6371.0
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    return 2*R*math.asin(math.sqrt(a))
+    a = np.sin((lat2_r - lat1_r)/2)**2 + math.cos(lat1_r) * cos_lat2 * np.sin((lon2_r - lon1_r)/2)**2
+    return 2*R*np.arcsin(np.sqrt(a))
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; lat2/lon2 may be NumPy arrays (vectorized)."""
+    lat2_r = np.radians(lat2)
+    return _haversine_rad(math.radians(lat1), math.radians(lon1), lat2_r, np.radians(lon2), np.cos(lat2_r))
 
 def nearest_wells_for_point(df, lat, lon, n=5):
-    # compute distances vectorized for speed
-    dists = df.apply(lambda r: haversine(lat, lon, float(r["Lat"]), float(r["Lon"])), axis=1)
-    df2 = df.copy()
-    df2["dist_km"] = dists
-    df2 = df2.sort_values("dist_km").head(n)
-    return df2[["StationCode", "Lat", "Lon", "WaterLevel_m_bgl", "Datetime", "dist_km"]]
+    # compute distances vectorized for speed (radians are precomputed by load_wells)
+    if "_lat_rad" not in df.columns:
+        df = _with_radians(df)
+    dists = _haversine_rad(math.radians(lat), math.radians(lon), df["_lat_rad"].to_numpy(),
+                           df["_lon_rad"].to_numpy(), df["_cos_lat"].to_numpy())
+    k = min(int(n), dists.size)
+    if k <= 0:
+        return df.iloc[:0][OUTPUT_COLUMNS].assign(dist_km=np.array([], dtype=float))
+    # O(N) selection of the n closest, then sort just those
+    top = np.argpartition(dists, k - 1)[:k]
+    top = top[np.argsort(dists[top])]
+    df2 = df.iloc[top][OUTPUT_COLUMNS].copy()
+    df2["dist_km"] = dists[top].astype(float)
+    return df2
 
-def load_wells(csv_path=CSV_PATH):
+def _with_radians(df):
+    # float32 scan columns: 5-decimal coordinates fit easily and the scan moves half the bytes
+    lat_r = np.radians(df["Lat"].to_numpy(dtype=np.float32))
+    return df.assign(_lat_rad=lat_r, _lon_rad=np.radians(df["Lon"].to_numpy(dtype=np.float32)),
+                     _cos_lat=np.cos(lat_r))
+
+def nearest_wells_batch(df, tree, tree_rows, lats, lons, n=5):
+    """
+    nearest_wells_for_point for many points: one BallTree query for the whole batch
+    (tree/tree_rows come from load_wells_index); linear scan when there is no tree.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    k = min(int(n), 0 if tree_rows is None else tree_rows.size)
+    ok = np.isfinite(lats) & np.isfinite(lons)
+    if tree is None or k <= 0 or not ok.any():
+        return [nearest_wells_for_point(df, a, b, n=n) for a, b in zip(lats, lons)]
+
+    d, idx = tree.query(np.radians(np.column_stack([lats[ok], lons[ok]])), k=k)
+    hits = iter(zip(d, idx))
+    results = []
+    for lat, lon, valid in zip(lats, lons, ok):
+        if not valid:
+            results.append(nearest_wells_for_point(df, lat, lon, n=n))
+            continue
+        dist, rows = next(hits)
+        res = df.iloc[tree_rows[rows]][OUTPUT_COLUMNS].copy()
+        res["dist_km"] = dist * 6371.0
+        results.append(res)
+    return results
+
+@lru_cache(maxsize=1)
+def _load_wells_cached(csv_path, mtime):
+    """
+    Wells table (groundwater_offline's loader and its Parquet sidecar) + radians
+    columns + haversine BallTree, memoized per (path, mtime). Callers must not
+    mutate the frame.
+    """
+    df = _load_wells(Path(csv_path))
+    tree = tree_rows = None
+    if "Lat" in df.columns and "Lon" in df.columns:
+        df = _with_radians(df)
+        # tree in full precision; the float32 columns only feed the linear scan
+        lat_r = np.radians(df["Lat"].to_numpy(dtype=float))
+        lon_r = np.radians(df["Lon"].to_numpy(dtype=float))
+        tree_rows = np.flatnonzero(np.isfinite(lat_r) & np.isfinite(lon_r))
+        if BallTree is not None and tree_rows.size:
+            tree = BallTree(np.column_stack([lat_r[tree_rows], lon_r[tree_rows]]), metric="haversine")
+    return df, tree, tree_rows
+
+def load_wells_index(csv_path=CSV_PATH):
+    """(wells DataFrame, BallTree or None, wells row positions indexed by the tree)."""
     try:
-        df = pd.read_csv(csv_path)
+        df, tree, tree_rows = _load_wells_cached(csv_path, os.path.getmtime(csv_path))
     except FileNotFoundError:
         print(f"❌ Groundwater CSV not found: {csv_path}")
         sys.exit(1)
     except Exception as e:
         print(f"❌ Error loading CSV: {e}")
         sys.exit(1)
-    # ensure numeric columns
-    df = df.rename(columns=lambda c: c.strip())
+    # required coordinate columns
     if "Lat" not in df.columns or "Lon" not in df.columns:
         print("❌ CSV missing 'Lat' or 'Lon' columns.")
         sys.exit(1)
-    return df
+    return df, tree, tree_rows
+
+def load_wells(csv_path=CSV_PATH):
+    return load_wells_index(csv_path)[0]
 
 def run_single(lat, lon, n):
-    df = load_wells()
-    res = nearest_wells_for_point(df, lat, lon, n=n)
+    res = nearest_wells_batch(*load_wells_index(), [lat], [lon], n=n)[0]
     if res.empty:
         print("No wells found in CSV.")
         return
@@ -69,11 +146,12 @@ def run_from_file(points_csv, n):
     else:
         # normalize to lowercase column names
         pts = pts.rename(columns={c:c.lower() for c in pts.columns})
-    df = load_wells()
-    for i, row in pts.iterrows():
-        lat = float(row["lat"]); lon = float(row["lon"])
+    lats = pts["lat"].astype(float).to_numpy()
+    lons = pts["lon"].astype(float).to_numpy()
+    # all points in one k-NN query
+    results = nearest_wells_batch(*load_wells_index(), lats, lons, n=n)
+    for i, (lat, lon, res) in enumerate(zip(lats, lons, results)):
         print(f"\n=== Point #{i+1}: {lat},{lon} ===")
-        res = nearest_wells_for_point(df, lat, lon, n=n)
         if res.empty:
             print("  No wells found.")
         else:
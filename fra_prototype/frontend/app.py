@@ -1,20 +1,65 @@
 # frontend/app.py
 import streamlit as st
 import requests
+import io
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: GeoParquet needs pyarrow, GeoJSON is used without it
+    pa = None
 API_URL = "http://127.0.0.1:8000"
 
 
 st.set_page_config(layout="wide")
 st.title("FRA Data and Decision Support Prototype")
 
+# --- Cached API calls: widget reruns with the same inputs skip the HTTP round-trip ---
+@st.cache_resource
+def _session():
+    # one keep-alive connection pool for the whole server process (the script itself reruns)
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+def _get_text(session, path, timeout=20):
+    res = session.get(f"{API_URL}{path}", timeout=timeout)
+    res.raise_for_status()
+    return res.text
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_json_text(path, timeout=20):
+    """GET API_URL + path and return the body text; HTTP errors raise (and are not cached)."""
+    return _get_text(_session(), path, timeout)
+
+def _get_gdf(session, kind, village, timeout=20):
+    """GeoParquet endpoint first (one buffer, WKB geometry); GeoJSON for older backends."""
+    if pa is not None:
+        try:
+            res = session.get(f"{API_URL}/api/parquet/{kind}/{village}", timeout=timeout)
+            res.raise_for_status()
+            return gpd.read_parquet(io.BytesIO(res.content)).set_crs("EPSG:4326", allow_override=True)
+        except (requests.RequestException, pa.ArrowInvalid, OSError):
+            pass  # no Parquet endpoint or an unreadable body: fall back to GeoJSON
+    return geojson_to_gdf(_get_text(session, f"/api/{kind}/{village}", timeout))
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_village_gdfs(village):
+    """(claims, assets) GeoDataFrames for a village, both requests in flight at once."""
+    session = _session()  # resolved on the script thread, shared by both workers
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        claims = pool.submit(_get_gdf, session, "claims", village)
+        assets = pool.submit(_get_gdf, session, "assets", village)
+        return claims.result(), assets.result()
+
 # --- Fetch list of villages for the dropdown ---
 try:
-    villages_res = requests.get(f"{API_URL}/api/villages", timeout=10)
-    villages_res.raise_for_status()
-    villages_df = pd.DataFrame(villages_res.json())
+    villages_df = pd.DataFrame(json.loads(fetch_json_text("/api/villages", timeout=10)))
     village_list = villages_df['village'].tolist() if not villages_df.empty else []
 except Exception as e:
     st.error(f"Connection to backend API failed: {e}")
@@ -31,25 +76,39 @@ def geojson_to_gdf(geojson_obj):
     features = gj.get("features", [])
     if not features:
         return gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
-    return gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+    # all geometries in one vectorized shapely call instead of shape() per feature
+    geoms = shapely.from_geojson(np.array(
+        [json.dumps(f["geometry"]) if f.get("geometry") else None for f in features], dtype=object))
+    props = pd.DataFrame([f.get("properties") or {} for f in features])
+    return gpd.GeoDataFrame(props, geometry=geoms, crs="EPSG:4326")
+
+def _attribute_columns(gdf):
+    """Non-geometry columns, for display by projection rather than a drop() copy."""
+    return [c for c in gdf.columns if c != "geometry"]
 
 if selected_village:
     st.header(f"Data for {selected_village}")
 
     # --- Fetch and display data from API ---
-    claims_res = requests.get(f"{API_URL}/api/claims/{selected_village}", timeout=20)
-    assets_res = requests.get(f"{API_URL}/api/assets/{selected_village}", timeout=20)
+    try:
+        claims_gdf, assets_gdf = fetch_village_gdfs(selected_village)
+        fetch_error = None
+    except requests.RequestException as e:
+        fetch_error = e
 
-    if claims_res.status_code == 200 and assets_res.status_code == 200:
-        claims_gdf = geojson_to_gdf(claims_res.json())
-        assets_gdf = geojson_to_gdf(assets_res.json())
+    if fetch_error is None:
 
         # --- FRA Atlas ---
         st.subheader("FRA Atlas")
 
         if not claims_gdf.empty:
-            claims_gdf['lat'] = claims_gdf.geometry.y
-            claims_gdf['lon'] = claims_gdf.geometry.x
+            # one (N, 2) x/y pass; fall back to .x/.y (NaN) if any point is missing or empty
+            coords = shapely.get_coordinates(claims_gdf.geometry.values)
+            if len(coords) == len(claims_gdf):
+                claims_gdf[['lat', 'lon']] = coords[:, ::-1]
+            else:
+                claims_gdf['lat'] = claims_gdf.geometry.y
+                claims_gdf['lon'] = claims_gdf.geometry.x
             st.map(claims_gdf[['lat','lon']])
         else:
             st.write("No claim points to display on map.")
@@ -57,16 +116,16 @@ if selected_village:
         col1, col2 = st.columns(2)
         with col1:
             st.write("Claims Data")
-            st.dataframe(claims_gdf.drop(columns='geometry', errors='ignore'))
+            st.dataframe(claims_gdf[_attribute_columns(claims_gdf)])
         with col2:
             st.write("Mapped Assets")
-            st.dataframe(assets_gdf.drop(columns='geometry', errors='ignore'))
+            st.dataframe(assets_gdf[_attribute_columns(assets_gdf)])
 
         # --- DSS demo (simple)
         st.subheader("Decision Support System (DSS) Recommendations")
         if not assets_gdf.empty:
-            types = assets_gdf['asset_type'].astype(str).tolist()
-            if any(t in types for t in ("cropland", "farm")):
+            types = set(assets_gdf['asset_type'].astype(str).unique())
+            if types & {"cropland", "farm"}:
                 st.success("✅ PM-KISAN / livelihood support recommended (cropland present).")
             if "water_body" not in types:
                 st.warning("⚠️ Prioritize Jal Shakti works (no surface water mapped).")
@@ -75,4 +134,4 @@ if selected_village:
         else:
             st.info("No asset data to generate recommendations.")
     else:
-        st.error(f"Could not fetch data. Claims status: {claims_res.status_code}, Assets status: {assets_res.status_code}")
+        st.error(f"Could not fetch data: {fetch_error}")
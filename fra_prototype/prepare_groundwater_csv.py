@@ -1,8 +1,15 @@
 # prepare_groundwater_csv.py
 import os
 import re
+import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: fall back to pandas' single-threaded tokenizer
+    pacsv = None
+
 RAW = os.path.join("sample_data", "Atal_Jal_Disclosed_Ground_Water_Level-2015-2022.csv")
 OUT = os.path.join("sample_data", "groundwater_levels.csv")
 
@@ -12,76 +19,96 @@ COL_LAT, COL_LON, COL_WELL = "Latitude", "Longitude", "Well_ID"
 SEASON_RE = re.compile(r"^(Pre|Post)-monsoon_(\d{4}).*", re.IGNORECASE)
 
 def find_seasonal_columns(df):
-    found = []
-    for c in df.columns:
-        m = SEASON_RE.match(str(c).strip())
-        if m:
-            season = m.group(1).title()
-            year = int(m.group(2))
-            found.append((c, season, year))
-    return found
-
-def choose_latest_value(row, seasonal_cols):
+    # one precompiled match per header label; labels are returned unstripped for df[...] lookups
+    # (lstrip() hands back the same str when there is nothing to strip; trailing text never matters)
+    return [(c, m.group(1).title(), int(m.group(2)))
+            for c in df.columns
+            for m in [SEASON_RE.match((c if isinstance(c, str) else str(c)).lstrip())] if m]
+
+def read_raw_csv(path):
+    """Raw Atal Jal CSV (latin1); multi-threaded pyarrow parse with pinned key-column types when available."""
+    if pacsv is not None:
+        try:
+            table = pacsv.read_csv(
+                path,
+                read_options=pacsv.ReadOptions(encoding="latin1", block_size=8 << 20, use_threads=True),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={COL_LAT: pa.float64(), COL_LON: pa.float64(), COL_WELL: pa.string()},
+                    strings_can_be_null=True,
+                ),
+            )
+            return table.to_pandas(self_destruct=True)
+        except pa.ArrowInvalid:
+            pass  # e.g. stray text in Latitude/Longitude: let pandas parse, coerced below
+    return pd.read_csv(path, encoding="latin1")
+
+def latest_values(df, seasonal_cols):
     """
-    Pick the most recent non-null water level for this row.
+    Most recent non-null water level per row, for all rows at once.
     Preference: higher year first, within same year Post before Pre.
+    Returns (values, labels, priorities); rows without any value get NaN / None / -1.
+    priority = year*2 + (season == "Post"), i.e. larger is more recent.
     """
-    # sort by year desc, Post first
-    order = sorted(seasonal_cols, key=lambda t: (t[2], 1 if t[1]=="Pre" else 2), reverse=True)
-    for col, season, year in order:
-        val = row.get(col)
-        if pd.notna(val):
-            try:
-                v = float(val)
-                return v, f"{season}-monsoon_{year}"
-            except Exception:
-                continue
-    return None, None
+    cols = [c for c, _, _ in seasonal_cols]
+    # already-numeric columns are copied as one block; the text ones (stray markers in the
+    # file) go through a single to_numeric call together instead of one call per column
+    is_num = np.array([pd.api.types.is_numeric_dtype(df[c]) for c in cols], dtype=bool)
+    vals = np.empty((len(df), len(cols)), dtype=np.float64)
+    if is_num.any():
+        vals[:, is_num] = df[[c for c, n in zip(cols, is_num) if n]].to_numpy(dtype=np.float64)
+    if not is_num.all():
+        raw = df[[c for c, n in zip(cols, is_num) if not n]].to_numpy(dtype=object)
+        vals[:, ~is_num] = pd.to_numeric(raw.ravel(), errors="coerce").astype(np.float64).reshape(raw.shape)
+    # rank of each column; the first column wins ties, as in a stable sort
+    priority = np.array([year * 2 + (season == "Post") for _, season, year in seasonal_cols])
+    ranked = np.where(np.isnan(vals), -1, priority)
+    winner = ranked.argmax(axis=1)
+    rows = np.arange(len(df))
+    has_value = ranked[rows, winner] >= 0
+    labels = np.array([f"{season}-monsoon_{year}" for _, season, year in seasonal_cols], dtype=object)
+    values = np.where(has_value, vals[rows, winner], np.nan)
+    return values, np.where(has_value, labels[winner], None), ranked[rows, winner]
 
 def main():
     if not os.path.exists(RAW):
         raise FileNotFoundError(f"Missing: {RAW}")
 
-    # file uses latin1 encoding
-    df = pd.read_csv(RAW, encoding="latin1")
+    df = read_raw_csv(RAW)
 
     seasonal_cols = find_seasonal_columns(df)
     if not seasonal_cols:
         raise ValueError("❌ No seasonal water level columns found.")
 
-    out_rows = []
-    for _, row in df.iterrows():
-        lat = pd.to_numeric(row.get(COL_LAT), errors="coerce")
-        lon = pd.to_numeric(row.get(COL_LON), errors="coerce")
-        well = row.get(COL_WELL)
-
-        if pd.isna(lat) or pd.isna(lon):
-            continue
-
-        val, label = choose_latest_value(row, seasonal_cols)
-        if val is None:
-            continue
-
-        out_rows.append({
-            "StationCode": str(well) if pd.notna(well) else None,
-            "Lat": float(lat),
-            "Lon": float(lon),
-            "WaterLevel_m_bgl": float(val),
-            "Datetime": label,  # e.g. "Post-monsoon_2019"
-        })
-
-    if not out_rows:
+    lat = pd.to_numeric(df[COL_LAT], errors="coerce").to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(df[COL_LON], errors="coerce").to_numpy(dtype=np.float64)
+    values, labels, priority = latest_values(df, seasonal_cols)
+    keep = ~(np.isnan(lat) | np.isnan(lon)) & pd.notna(labels)
+
+    well = (df[COL_WELL] if COL_WELL in df.columns else pd.Series(None, index=df.index, dtype=object))[keep]
+    clean = pd.DataFrame({
+        "StationCode": well.astype(str).where(well.notna(), None).to_numpy(dtype=object),
+        "Lat": lat[keep],
+        "Lon": lon[keep],
+        "WaterLevel_m_bgl": values[keep],
+        "Datetime": labels[keep],  # e.g. "Post-monsoon_2019"
+    })
+    priority = priority[keep]
+
+    if clean.empty:
         raise ValueError("❌ No wells with valid water levels found.")
 
-    clean = pd.DataFrame(out_rows)
-
-    # Drop duplicates, keep the most recent per well
-    if "StationCode" in clean.columns and clean["StationCode"].notna().any():
-        clean = clean.sort_values("Datetime").drop_duplicates(subset=["StationCode"], keep="last")
+    # Drop duplicates, keep the most recent per well: one hash groupby on the numeric
+    # priority instead of sorting the whole frame (rows stay in file order). Ties on
+    # priority go to the last row in the file, as sort + drop_duplicates(keep="last") did.
+    if clean["StationCode"].notna().any():
+        keys = [clean["StationCode"]]
     else:
-        clean["coord_key"] = clean["Lat"].round(5).astype(str) + "," + clean["Lon"].round(5).astype(str)
-        clean = clean.sort_values("Datetime").drop_duplicates(subset=["coord_key"], keep="last")
-        clean = clean.drop(columns=["coord_key"])
+        # integer coordinate keys (1e-5 deg) instead of building "lat,lon" strings
+        keys = [np.round(clean["Lat"].to_numpy() * 1e5).astype(np.int64),
+                np.round(clean["Lon"].to_numpy() * 1e5).astype(np.int64)]
+    rank = priority.astype(np.int64) * len(clean) + np.arange(len(clean))
+    latest = pd.Series(rank, index=clean.index).groupby(keys, dropna=False, sort=False).idxmax()
+    clean = clean.loc[np.sort(latest.to_numpy())]
 
     clean.to_csv(OUT, index=False)
     print(f"✅ Saved cleaned groundwater CSV: {OUT} (rows={len(clean)})")
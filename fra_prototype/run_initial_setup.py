@@ -1,7 +1,7 @@
 # run_initial_setup.py
 import sqlite3
-import pandas as pd
 import geopandas as gpd
+import shapely
 from shapely.geometry import Point
 
 from backend.database import create_database, save_data_to_db, DB_PATH
@@ -13,34 +13,25 @@ from ai_models.map_visualizer import generate_claim_asset_map
 SAMPLE_DOC_PATH = "sample_data/sample_doc.png"
 
 
-def _insert_claim_and_get_id(claim_row: dict) -> int:
+def _insert_claim_and_get_id(claim_row: dict, conn: sqlite3.Connection) -> int:
     """
-    Inserts one claim row via save_data_to_db (so schema stays consistent),
-    then returns the auto-incremented 'id' for the last inserted claim.
+    Inserts one claim row (geometry stored as WKB, like save_data_to_db) and gets
+    its auto-incremented 'id' back from the same statement via INSERT ... RETURNING.
+    Runs inside the caller's transaction on `conn`.
     """
-    # Build GeoDataFrame for the claim
     lat, lon = map(float, claim_row["coordinates"].split(","))
-    claim_gdf = gpd.GeoDataFrame(
-        pd.DataFrame([claim_row]),
-        geometry=[Point(lon, lat)],  # (x=lon, y=lat)
-        crs="EPSG:4326"
-    )
-
-    # Save claim
-    save_data_to_db(claim_gdf, "fra_claims")
+    row = {**claim_row, "geometry": shapely.to_wkb(Point(lon, lat))}  # (x=lon, y=lat)
 
-    # Fetch its id
-    conn = sqlite3.connect(DB_PATH)
-    row = conn.execute(
-        "SELECT id, patta_holder, village, coordinates FROM fra_claims ORDER BY id DESC LIMIT 1;"
+    columns = ", ".join(row)
+    placeholders = ", ".join("?" * len(row))
+    inserted = conn.execute(
+        f"INSERT INTO fra_claims ({columns}) VALUES ({placeholders}) RETURNING id",
+        tuple(row.values()),
     ).fetchone()
-    conn.close()
 
-    if not row:
+    if not inserted:
         raise RuntimeError("Failed to retrieve inserted claim id.")
-
-    claim_id = int(row[0])
-    return claim_id
+    return int(inserted[0])
 
 
 def run_setup():
@@ -65,35 +56,49 @@ def run_setup():
     claim_data.setdefault("village", "Unknown")
     claim_data.setdefault("claim_status", "Unknown")
 
-    # 3) Insert claim and get its id
-    claim_id = _insert_claim_and_get_id(claim_data)
-    print(f"📍 Claim saved (id={claim_id}) with coords: {lat},{lon}")
-
-    # Build claim_gdf for mapping
+    # Build claim_gdf for mapping (the claim id is filled in once the row is inserted)
     claim_gdf = gpd.GeoDataFrame(
-        [{"id": claim_id, **claim_data}],
+        [claim_data],
         geometry=[Point(lon, lat)],
         crs="EPSG:4326"
     )
 
-    # 4) Asset mapping
+    # 3) Asset mapping: network-bound, so it runs before any write transaction is open
     print("\n--- Starting Real Asset Mapping ---")
     asset_gdf = map_assets_from_satellite_image(claim_gdf)
 
-    # 5) Save assets with claim_id + village
+    # One connection for every setup write: WAL + synchronous=NORMAL, and the claim and
+    # its assets go in as a single transaction (one fsync instead of one per statement)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    try:
+        # 4) Insert claim and get its id
+        claim_id = _insert_claim_and_get_id(claim_data, conn)
+        claim_gdf.insert(0, "id", claim_id)
+
+        # 5) Save assets with claim_id + village
+        if asset_gdf is not None and not asset_gdf.empty:
+            asset_gdf = asset_gdf.copy()
+            asset_gdf["claim_id"] = claim_id
+            asset_gdf["village"] = claim_data["village"]
+            save_data_to_db(asset_gdf, "fra_assets", conn=conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    print(f"📍 Claim saved (id={claim_id}) with coords: {lat},{lon}")
+
     if asset_gdf is not None and not asset_gdf.empty:
-        asset_gdf = asset_gdf.copy()
-        asset_gdf["claim_id"] = claim_id
-        asset_gdf["village"] = claim_data["village"]
-        save_data_to_db(asset_gdf, "fra_assets")
         print("✅ Assets successfully detected and saved to database.")
 
         # 6) Generate claim + assets map (opens HTML in your browser from map_visualizer)
-        map_path = generate_claim_asset_map(claim_gdf, asset_gdf)
+        map_path = generate_claim_asset_map(claim_gdf, asset_gdf, open_browser=True)
         print(f"🗺️ Claim + assets map generated: {map_path}")
     else:
         print("ℹ️ No assets were detected in the satellite image.")
 
-
 if __name__ == "__main__":
     run_setup()